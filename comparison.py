@@ -1,6 +1,5 @@
 import os
 import json
-from anthropic import Anthropic
 from db import SessionLocal
 from models import WeeklySnapshot, ThemeSnapshot
 
@@ -1,3 +1,5 @@
+import os
+
 KNOWN_APPS = {
 
     # ─────────────────────────────────────
@@ -116,4 +118,28 @@ KNOWN_APPS = {
     "etsy": {"playstore": "com.etsy.android", "appstore": "477128284"},
     "shopify": {"playstore": "com.shopify.mobile", "appstore": "371294472"},
 
-}
\ No newline at end of file
+}
+
+
+# ==========================================================
+# LLM PROVIDER AND MODEL TIERS
+# Call sites name a tier, not a model. LLM_PROVIDER picks the
+# backend (anthropic | local); LLM_MODEL_<TIER> overrides one
+# tier's model, e.g. LLM_MODEL_INSIGHTS=claude-3-5-sonnet-latest.
+# ==========================================================
+LLM_PROVIDER = os.getenv("LLM_PROVIDER", "anthropic").strip().lower()
+
+LLM_MODEL_TIERS = {
+    "anthropic": {
+        "classify": "claude-3-haiku-20240307",
+        "cluster":  "claude-3-haiku-20240307",
+        "insights": "claude-3-haiku-20240307",
+        "enrich":   "claude-3-haiku-20240307",
+    },
+    "local": {
+        "classify": "local-classify",
+        "cluster":  "local-cluster",
+        "insights": "local-insights",
+        "enrich":   "local-enrich",
+    },
+}
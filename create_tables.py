@@ -1,4 +1,3 @@
-from db import engine
-from models import Base
+from db import init_schema
 
-Base.metadata.create_all(bind=engine)
\ No newline at end of file
+init_schema()
\ No newline at end of file
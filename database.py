@@ -0,0 +1,275 @@
+"""
+Signal persistence: stored signals, per-source high-water marks, the
+sentiment and insight memos, and per-run pipeline metrics.
+
+DB interactions only — no LLM logic, no scraping logic. Every function is
+failure-safe: a database error is printed and the caller gets an empty /
+neutral result, so collection still works without persistence.
+"""
+
+import hashlib
+import json
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from sqlalchemy.exc import IntegrityError
+
+from db import SessionLocal, init_schema
+from models import InsightMemo, PipelineRun, Signal, SourceWatermark
+
+_SIGNAL_FIELDS = ("source", "term", "text", "title", "score", "url", "date")
+
+
+def content_key(signal: dict) -> str:
+    """Stable identity for a signal's content: URL plus a hash of its text."""
+    body = f"{signal.get('url', '')}\n{signal.get('title', '')}\n{signal.get('text', '')}"
+    return hashlib.sha1(body.encode("utf-8")).hexdigest()
+
+
+def _row_to_signal(row: Signal) -> dict:
+    return {
+        "source": row.source,
+        "term":   row.term,
+        "text":   row.text or "",
+        "title":  row.title or "",
+        "score":  row.score or 0.0,
+        "url":    row.url,
+        "date":   row.date,
+    }
+
+
+# ==========================================================
+# WATERMARKS
+# ==========================================================
+def load_watermark(source: str, term: str) -> Optional[datetime]:
+    """Return the newest signal date stored for (source, term), or None."""
+    try:
+        init_schema()
+        db = SessionLocal()
+        try:
+            mark = db.query(SourceWatermark).filter(
+                SourceWatermark.source == source,
+                SourceWatermark.term == term,
+            ).first()
+        finally:
+            db.close()
+        if not mark or not mark.last_date:
+            return None
+        return datetime.strptime(mark.last_date, "%Y-%m-%d").replace(tzinfo=timezone.utc)
+    except Exception as e:
+        print(f"[DB] Watermark load failed for {source}/'{term}': {e}")
+        return None
+
+
+# ==========================================================
+# SIGNAL WINDOW
+# ==========================================================
+def save_signals(source: str, term: str, signals: list) -> None:
+    """
+    Upsert freshly collected signals by URL and advance the watermark to the
+    newest date among them.
+    """
+    if not signals:
+        return
+    try:
+        init_schema()
+        db = SessionLocal()
+        try:
+            urls = [s["url"] for s in signals]
+            existing = {
+                row.url: row for row in db.query(Signal).filter(
+                    Signal.source == source, Signal.url.in_(urls)
+                )
+            }
+            for s in signals:
+                row = existing.get(s["url"])
+                if row is None:
+                    row = Signal(product=term)
+                    db.add(row)
+                    existing[s["url"]] = row
+                for field in _SIGNAL_FIELDS:
+                    setattr(row, field, s.get(field))
+                row.term = term   # normalised key, whatever case the scraper echoed
+                key = content_key(s)
+                if row.content_key != key:
+                    row.content_key = key
+                    row.sentiment = None   # edited content — classify again
+
+            newest = max(signals, key=lambda s: s.get("date") or "")
+            mark = db.query(SourceWatermark).filter(
+                SourceWatermark.source == source,
+                SourceWatermark.term == term,
+            ).first()
+            if mark is None:
+                mark = SourceWatermark(source=source, term=term)
+                db.add(mark)
+            if not mark.last_date or newest["date"] >= mark.last_date:
+                mark.last_date = newest["date"]
+                mark.last_url = newest["url"]
+                mark.updated_at = datetime.utcnow()
+
+            db.commit()
+        finally:
+            db.close()
+    except Exception as e:
+        print(f"[DB] Saving {len(signals)} signals failed for {source}/'{term}': {e}")
+
+
+def load_window(source: str, term: str, since: datetime) -> list:
+    """Return stored signals for (source, term) dated on or after `since`."""
+    try:
+        init_schema()
+        db = SessionLocal()
+        try:
+            rows = db.query(Signal).filter(
+                Signal.source == source,
+                Signal.term == term,
+                Signal.date >= since.strftime("%Y-%m-%d"),
+            ).all()
+        finally:
+            db.close()
+        return [_row_to_signal(r) for r in rows]
+    except Exception as e:
+        print(f"[DB] Window load failed for {source}/'{term}': {e}")
+        return []
+
+
+# ==========================================================
+# SENTIMENT MEMO
+# A review's sentiment does not change while its content does
+# not, so LLM labels are stored on the Signal row by content
+# key and reused on later runs.
+# ==========================================================
+def load_sentiments(keys: list) -> dict:
+    """Return {content_key: sentiment} for every key with a stored label."""
+    if not keys:
+        return {}
+    try:
+        init_schema()
+        db = SessionLocal()
+        try:
+            found = {}
+            unique = list(set(keys))
+            for i in range(0, len(unique), 500):   # stay under SQLite's variable limit
+                rows = db.query(Signal.content_key, Signal.sentiment).filter(
+                    Signal.content_key.in_(unique[i:i + 500]),
+                    Signal.sentiment.isnot(None),
+                )
+                found.update(dict(rows))
+        finally:
+            db.close()
+        return found
+    except Exception as e:
+        print(f"[DB] Sentiment lookup failed for {len(keys)} signals: {e}")
+        return {}
+
+
+def save_sentiments(signals: list) -> None:
+    """
+    Store each signal's "sentiment" under its content key. Signals not yet
+    persisted (e.g. classified while collection is still streaming) get a
+    row of their own; save_signals later upserts it by URL.
+    """
+    if not signals:
+        return
+    try:
+        init_schema()
+        db = SessionLocal()
+        try:
+            by_key = {content_key(s): s for s in signals}
+            keys = list(by_key)
+            rows = []
+            for i in range(0, len(keys), 500):
+                rows.extend(db.query(Signal).filter(Signal.content_key.in_(keys[i:i + 500])))
+            for row in rows:
+                row.sentiment = by_key[row.content_key]["sentiment"]
+            for key in set(by_key) - {row.content_key for row in rows}:
+                s = by_key[key]
+                term = (s.get("term") or "").strip().lower()
+                row = Signal(product=term, content_key=key, sentiment=s["sentiment"])
+                for field in _SIGNAL_FIELDS:
+                    setattr(row, field, s.get(field))
+                row.term = term
+                db.add(row)
+            db.commit()
+        finally:
+            db.close()
+    except Exception as e:
+        print(f"[DB] Saving sentiment for {len(signals)} signals failed: {e}")
+
+
+# ==========================================================
+# INSIGHT MEMO
+# ==========================================================
+_INSIGHT_TTL = timedelta(days=30)
+
+
+def load_insights(fingerprint: str) -> Optional[dict]:
+    """Return stored insights for a theme fingerprint, or None if absent or stale."""
+    try:
+        init_schema()
+        db = SessionLocal()
+        try:
+            memo = db.query(InsightMemo).filter(InsightMemo.fingerprint == fingerprint).first()
+        finally:
+            db.close()
+        if memo is None:
+            return None
+        stored_at = memo.refreshed_at or memo.created_at
+        if stored_at is None or stored_at.replace(tzinfo=None) < datetime.utcnow() - _INSIGHT_TTL:
+            return None
+        return json.loads(memo.insights)
+    except Exception as e:
+        print(f"[DB] Insight memo lookup failed: {e}")
+        return None
+
+
+def save_insights(product: str, fingerprint: str, category: str, insights: dict) -> None:
+    """Store insights under their theme fingerprint, replacing a stale entry."""
+    try:
+        init_schema()
+        db = SessionLocal()
+        try:
+            memo = db.query(InsightMemo).filter(InsightMemo.fingerprint == fingerprint).first()
+            if memo is None:
+                memo = InsightMemo(fingerprint=fingerprint)
+                db.add(memo)
+            memo.product = product.strip().lower()
+            memo.category = category
+            memo.insights = json.dumps(insights)
+            memo.refreshed_at = datetime.utcnow()
+            db.commit()
+        except IntegrityError:
+            db.rollback()   # a concurrent run stored the same fingerprint
+        finally:
+            db.close()
+    except Exception as e:
+        print(f"[DB] Saving insight memo failed for '{product}': {e}")
+
+
+# ==========================================================
+# RUN METRICS
+# ==========================================================
+def save_run_metrics(product: str, snapshot: dict) -> None:
+    """Store one run's metrics snapshot (see metrics.RunMetrics.snapshot)."""
+    try:
+        init_schema()
+        db = SessionLocal()
+        try:
+            totals = snapshot.get("totals", {})
+            db.add(PipelineRun(
+                product=product.strip().lower(),
+                total_seconds=snapshot.get("total_seconds"),
+                signals=snapshot.get("signals"),
+                llm_calls=totals.get("llm_calls", 0),
+                input_tokens=totals.get("input_tokens", 0),
+                output_tokens=totals.get("output_tokens", 0),
+                cost_usd=totals.get("cost_usd", 0.0),
+                http_requests=totals.get("http_requests", 0),
+                detail=json.dumps(snapshot),
+            ))
+            db.commit()
+        finally:
+            db.close()
+    except Exception as e:
+        print(f"[DB] Saving run metrics failed for '{product}': {e}")
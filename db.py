@@ -1,4 +1,6 @@
-from sqlalchemy import create_engine
+import threading
+
+from sqlalchemy import create_engine, inspect, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
@@ -15,4 +17,39 @@ SessionLocal = sessionmaker(
     bind=engine
 )
 
-Base = declarative_base()
\ No newline at end of file
+Base = declarative_base()
+
+_schema_ready = False
+_schema_lock = threading.Lock()
+
+
+def init_schema():
+    """
+    Create missing tables and add any columns the models gained since the
+    database file was created. SQLite has no migrations here, so new columns
+    are added with ALTER TABLE (all of them are nullable). Safe to call often.
+    """
+    global _schema_ready
+    with _schema_lock:
+        if _schema_ready:
+            return
+
+        import models  # noqa: F401 — registers every table on Base
+
+        Base.metadata.create_all(bind=engine)
+        inspector = inspect(engine)
+        with engine.begin() as conn:
+            for table in Base.metadata.sorted_tables:
+                existing = {c["name"] for c in inspector.get_columns(table.name)}
+                for column in table.columns:
+                    if column.name in existing:
+                        continue
+                    col_type = column.type.compile(dialect=engine.dialect)
+                    conn.execute(text(
+                        f"ALTER TABLE {table.name} ADD COLUMN {column.name} {col_type}"
+                    ))
+                    print(f"[DB] Added column {table.name}.{column.name}")
+                for index in table.indexes:
+                    index.create(bind=conn, checkfirst=True)
+
+        _schema_ready = True
@@ -0,0 +1,93 @@
+"""
+Near-duplicate signal elimination (SimHash + LSH banding).
+
+URL dedupe misses cross-posted Reddit threads, copy-paste store reviews and
+the same review surfacing under several competitor terms. Each signal gets
+a 64-bit SimHash over word 3-shingles of its normalised text; two signals
+within _MAX_DISTANCE bits are the same feedback. Candidates are found by
+splitting the hash into _BANDS bands — by pigeonhole, any pair within the
+distance shares at least one identical band — so lookup stays ~O(1).
+
+Collapsed signals are dropped; their representative carries
+"duplicate_count" (1 + number collapsed into it), which clustering uses
+as the signal's weight.
+"""
+
+import hashlib
+import re
+from typing import Optional
+
+_BITS         = 64
+_BANDS        = 8                    # must be > _MAX_DISTANCE
+_BAND_BITS    = _BITS // _BANDS
+_BAND_MASK    = (1 << _BAND_BITS) - 1
+_MAX_DISTANCE = 6
+_SHINGLE      = 3
+
+_URL_RE   = re.compile(r"https?://\S+")
+_NON_WORD = re.compile(r"[^a-z0-9]+")
+
+
+def _normalise(signal: dict) -> str:
+    text = f"{signal.get('title', '')} {signal.get('text', '')}".lower()
+    text = _URL_RE.sub(" ", text)
+    return _NON_WORD.sub(" ", text).strip()
+
+
+def _feature_hash(feature: str) -> int:
+    return int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def simhash(text: str) -> int:
+    """64-bit SimHash over word shingles (single words for very short texts)."""
+    words = text.split()
+    if len(words) >= _SHINGLE:
+        features = [" ".join(words[i:i + _SHINGLE]) for i in range(len(words) - _SHINGLE + 1)]
+    else:
+        features = words or [text]
+
+    # Column-wise bit vote: a bit is set when most features have it set
+    rows = [format(_feature_hash(f), "064b") for f in features]
+    half = len(rows) / 2
+    bits = "".join("1" if column.count("1") > half else "0" for column in zip(*rows))
+    return int(bits, 2)
+
+
+class NearDuplicateIndex:
+    """Incremental index: add() signals one at a time, in any order."""
+
+    def __init__(self):
+        self._bands = [dict() for _ in range(_BANDS)]   # band value -> [(hash, signal)]
+
+    def add(self, signal: dict) -> Optional[dict]:
+        """
+        Index a signal. If it is a near-duplicate of one already indexed,
+        bump that representative's duplicate_count and return it (the new
+        signal should be dropped). Otherwise return None.
+        """
+        h = simhash(_normalise(signal))
+        keys = [(h >> (band * _BAND_BITS)) & _BAND_MASK for band in range(_BANDS)]
+
+        for band, key in enumerate(keys):
+            for other_hash, rep in self._bands[band].get(key, ()):
+                if bin(h ^ other_hash).count("1") <= _MAX_DISTANCE:
+                    rep["duplicate_count"] = rep.get("duplicate_count", 1) + signal.get("duplicate_count", 1)
+                    return rep
+
+        signal.setdefault("duplicate_count", 1)
+        for band, key in enumerate(keys):
+            self._bands[band].setdefault(key, []).append((h, signal))
+        return None
+
+
+def collapse_near_duplicates(signals: list) -> list:
+    """
+    Collapse near-identical signals. The highest-scoring member of each group
+    is kept as representative; input order is otherwise preserved.
+    """
+    index = NearDuplicateIndex()
+    keep = set()
+    for i in sorted(range(len(signals)), key=lambda i: -signals[i].get("score", 0)):
+        if index.add(signals[i]) is None:
+            keep.add(i)
+    return [s for i, s in enumerate(signals) if i in keep]
@@ -1,8 +1,17 @@
 import re
-import requests
+from datetime import datetime, timedelta
+from typing import Optional
 from google_play_scraper import search as gp_search
-from db import SessionLocal
-from models import Product
+from sqlalchemy.exc import IntegrityError
+from config import KNOWN_APPS
+from db import SessionLocal, init_schema
+from models import Product, AppIdMiss
+import time
+import fixtures
+import http_client
+import metrics
+import rate_limiter
+from pipeline_dag import cancelled
 
 
 # ============================================
@@ -14,6 +23,7 @@ def normalize_name(name: str):
 
 
 def get_existing_product(normalized_name):
+    init_schema()
     db = SessionLocal()
     product = db.query(Product)\
         .filter(Product.normalized_name == normalized_name)\
@@ -22,23 +32,38 @@ def get_existing_product(normalized_name):
     return product
 
 
-def save_product(metadata):
-    db = SessionLocal()
+_METADATA_COLUMNS = (
+    "category",
+    "playstore_id", "playstore_installs", "playstore_rating",
+    "appstore_id", "appstore_rating",
+)
 
-    product = Product(
-        name=metadata["name"],
-        normalized_name=normalize_name(metadata["name"]),
-        category=metadata.get("category"),
 
-        playstore_id=metadata.get("playstore_id"),
-        playstore_installs=metadata.get("playstore_installs"),
-        playstore_rating=metadata.get("playstore_rating"),
-
-        appstore_id=metadata.get("appstore_id"),
-        appstore_rating=metadata.get("appstore_rating"),
+def _discovered(product) -> bool:
+    # Rows created by resolve_app_id / save_profile carry IDs or a profile only;
+    # rows from before discovered_at existed are recognised by their metadata
+    return product.discovered_at is not None or any(
+        getattr(product, c) is not None
+        for c in ("playstore_installs", "playstore_rating", "appstore_rating")
     )
 
-    db.add(product)
+
+def save_product(metadata):
+    """Create the product, or fill the discovered metadata into its existing row."""
+    init_schema()
+    db = SessionLocal()
+
+    normalized = normalize_name(metadata["name"])
+    product = db.query(Product).filter(Product.normalized_name == normalized).first()
+    if product is None:
+        product = Product(normalized_name=normalized)
+        db.add(product)
+    product.name = metadata["name"]
+    for column in _METADATA_COLUMNS:
+        if metadata.get(column) is not None:
+            setattr(product, column, metadata[column])
+    product.discovered_at = datetime.utcnow()
+
     db.commit()
     db.refresh(product)
     db.close()
@@ -46,18 +71,85 @@ def save_product(metadata):
     return product
 
 
+# ============================================
+# PRODUCT PROFILE
+# Validation, category and enrichment context are
+# stored on Product and reused until they go stale.
+# ============================================
+
+_PROFILE_TTL       = timedelta(days=14)
+_KNOWN_PROFILE_TTL = timedelta(days=90)   # curated apps do not change category
+
+
+def load_profile(product_name: str) -> Optional[dict]:
+    """Return the stored, still-fresh profile for a product, or None."""
+    normalized = normalize_name(product_name)
+    ttl = _KNOWN_PROFILE_TTL if product_name.strip().lower() in KNOWN_APPS else _PROFILE_TTL
+    try:
+        init_schema()
+        product = get_existing_product(normalized)
+    except Exception as e:
+        print(f"[Profile] Lookup failed for '{product_name}': {e}")
+        return None
+    if product is None or product.profile_refreshed_at is None or product.profile_category is None:
+        return None
+    if product.profile_refreshed_at < datetime.utcnow() - ttl:
+        return None
+    return {
+        "is_valid":           product.is_valid,
+        "category":           product.profile_category,
+        "enrichment_context": product.enrichment_context or "",
+    }
+
+
+def save_profile(product_name: str, profile: dict) -> None:
+    """Upsert the profile columns on the product's row."""
+    normalized = normalize_name(product_name)
+    try:
+        init_schema()
+        db = SessionLocal()
+        try:
+            for _ in range(2):
+                product = db.query(Product).filter(Product.normalized_name == normalized).first()
+                if product is None:
+                    product = Product(name=product_name, normalized_name=normalized)
+                    db.add(product)
+                product.is_valid = profile["is_valid"]
+                product.profile_category = profile["category"]
+                product.enrichment_context = profile["enrichment_context"]
+                product.profile_refreshed_at = datetime.utcnow()
+                try:
+                    db.commit()
+                    return
+                except IntegrityError:
+                    # Another request created the row first; update that one
+                    db.rollback()
+        finally:
+            db.close()
+    except Exception as e:
+        print(f"[Profile] Could not store profile for '{product_name}': {e}")
+
+
 # ============================================
 # GOOGLE PLAY DISCOVERY
 # ============================================
 
+def _gp_search(term: str) -> list:
+    """Rate-limited, recordable google-play-scraper search (top 5 hits)."""
+    def _live():
+        rate_limiter.acquire("play.google.com")
+        start = time.perf_counter()
+        try:
+            return gp_search(term, lang="en", country="us", n_hits=5)
+        finally:
+            metrics.record_http(time.perf_counter() - start)
+
+    return fixtures.through("playstore", ["search", term, 5], _live)
+
+
 def discover_playstore(product_name):
     try:
-        results = gp_search(
-            product_name,
-            lang="en",
-            country="us",
-            n_hits=5
-        )
+        results = _gp_search(product_name)
 
         if not results:
             return None
@@ -90,7 +182,7 @@ def discover_appstore(product_name):
             "limit": 5
         }
 
-        response = requests.get(url, params=params)
+        response = http_client.get(url, params=params)
         data = response.json()
 
         if data["resultCount"] == 0:
@@ -109,16 +201,159 @@ def discover_appstore(product_name):
         return None
 
 
+# ============================================
+# STORE APP ID RESOLUTION
+# Shared by both store scrapers:
+#   KNOWN_APPS -> Product table -> negative cache -> live search
+# Live hits are written back to the Product table.
+# ============================================
+
+_STORE_COLUMNS = {"playstore": "playstore_id", "appstore": "appstore_id"}
+_MISS_TTL = timedelta(days=7)
+
+
+def _search_playstore_id(term: str) -> Optional[str]:
+    """Search Play Store; accept a hit only if the term appears in its ID or title."""
+    results = _gp_search(term)
+    term_lower = term.lower().replace(" ", "")
+    for r in results:
+        app_id = r.get("appId", "") or ""
+        title = (r.get("title", "") or "").lower()
+        if term_lower in app_id.lower() or term.lower() in title:
+            return app_id
+    return None
+
+
+def _search_appstore_id(term: str) -> Optional[str]:
+    """
+    Search iTunes; accept a hit only if the term appears in its name or bundle
+    ID. Raises on a failed request, so only a real no-match counts as a miss.
+    """
+    response = http_client.get(
+        "https://itunes.apple.com/search",
+        params={"term": term, "entity": "software", "country": "us", "limit": 5},
+    )
+    if response.status_code != 200:
+        # Throttling / outages are not a miss: raise so nothing is recorded
+        raise RuntimeError(f"iTunes search returned HTTP {response.status_code}")
+    term_lower = term.lower().replace(" ", "")
+    for app in response.json().get("results", []):
+        name = (app.get("trackName", "") or "").lower()
+        bundle = (app.get("bundleId", "") or "").lower()
+        if term.lower() in name or term_lower in bundle:
+            return str(app.get("trackId"))
+    return None
+
+
+_SEARCHERS = {"playstore": _search_playstore_id, "appstore": _search_appstore_id}
+
+
+def _stored_app_id(normalized: str, store: str) -> tuple:
+    """Return (app_id, recently_missed) from the Product table and miss cache."""
+    db = SessionLocal()
+    try:
+        product = db.query(Product).filter(Product.normalized_name == normalized).first()
+        app_id = getattr(product, _STORE_COLUMNS[store]) if product else None
+        if app_id:
+            return app_id, False
+        miss = db.query(AppIdMiss).filter(
+            AppIdMiss.normalized_name == normalized,
+            AppIdMiss.store == store,
+            AppIdMiss.checked_at >= datetime.utcnow() - _MISS_TTL,
+        ).first()
+        return None, miss is not None
+    finally:
+        db.close()
+
+
+def _record_app_id(term: str, normalized: str, store: str, app_id: Optional[str]) -> None:
+    """
+    Write a live search result back: the ID onto Product (a new row is named
+    as the caller spelled the product), or refresh the miss entry.
+    """
+    db = SessionLocal()
+    try:
+        if app_id is None:
+            miss = db.query(AppIdMiss).filter(
+                AppIdMiss.normalized_name == normalized,
+                AppIdMiss.store == store,
+            ).first()
+            if miss is None:
+                db.add(AppIdMiss(normalized_name=normalized, store=store))
+            else:
+                miss.checked_at = datetime.utcnow()
+            db.commit()
+            return
+        for _ in range(2):
+            product = db.query(Product).filter(Product.normalized_name == normalized).first()
+            if product is None:
+                product = Product(name=term, normalized_name=normalized)
+                db.add(product)
+            setattr(product, _STORE_COLUMNS[store], app_id)
+            try:
+                db.commit()
+                return
+            except IntegrityError:
+                # The other store's scraper created the row concurrently — update it instead
+                db.rollback()
+    finally:
+        db.close()
+
+
+def resolve_app_id(term: str, store: str) -> Optional[str]:
+    """
+    Resolve a product name to its Play Store / App Store ID, or None.
+    Database problems degrade to a live search; search problems to None.
+    """
+    key = term.strip().lower()
+    known = KNOWN_APPS.get(key, {}).get(store)
+    if known:
+        return known
+
+    normalized = normalize_name(term)
+    if not fixtures.active():
+        try:
+            init_schema()
+            app_id, recently_missed = _stored_app_id(normalized, store)
+            if app_id:
+                return app_id
+            if recently_missed:
+                print(f"[Resolve] {store}: '{term}' missed recently, not searching again.")
+                return None
+        except Exception as e:
+            print(f"[Resolve] {store} lookup failed for '{term}': {e}")
+
+    if cancelled():
+        # The pipeline run this lookup belongs to is over (e.g. invalid product)
+        return None
+    try:
+        app_id = _SEARCHERS[store](key)
+    except Exception as e:
+        print(f"[Resolve] {store} search failed for '{term}': {e}")
+        return None
+
+    print(f"[Resolve] {store}: '{term}' -> {app_id or 'not found'}")
+    if fixtures.active() or cancelled():
+        return app_id
+    try:
+        _record_app_id(term, normalized, store, app_id)
+    except Exception as e:
+        print(f"[Resolve] Saving {store} ID failed for '{term}': {e}")
+    return app_id
+
+
 # ============================================
 # MAIN DISCOVERY ENTRY
 # ============================================
 
 def discover_product(product_name):
     normalized = normalize_name(product_name)
+    # Fixture runs leave discovery.db untouched (see fixtures)
+    stored = not fixtures.active()
 
     # Check if exists
-    existing = get_existing_product(normalized)
-    if existing:
+    existing = get_existing_product(normalized) if stored else None
+    if existing and _discovered(existing):
         print(f"Product already exists: {existing.name}")
         return existing
 
@@ -138,6 +373,11 @@ def discover_product(product_name):
     if app_data:
         metadata.update(app_data)
 
+    if not stored:
+        # Unsaved row with the same attributes, for callers that read .name etc.
+        return Product(normalized_name=normalized,
+                       **{c: metadata.get(c) for c in ("name",) + _METADATA_COLUMNS})
+
     # If nothing found, still create basic product entry
     product = save_product(metadata)
 
@@ -0,0 +1,114 @@
+"""
+Record / replay fixtures for every external call.
+
+FIXTURE_MODE=record   call the real service and save each response as JSON
+FIXTURE_MODE=replay   serve saved responses only — no network, no API key
+(unset)               pass straight through
+
+Fixtures live under FIXTURE_DIR (default data/fixtures/<kind>/<hash>.json),
+keyed by a hash of the call's identifying parts (URL, app ID + page, model +
+prompt, ...). In replay mode a missing fixture raises FixtureMissing, which
+callers already treat like any other failed request.
+
+Covered call sites:
+  http       — http_client.get (Reddit, iTunes RSS, iTunes search)
+  playstore  — google-play-scraper reviews() / search()
+  llm        — llm_gateway.create_message (every model call)
+
+In either mode callers also keep away from discovery.db state (products
+from discover_product, incremental collection, stored app IDs, sentiment /
+profile / insight memos, run metrics), so a replay makes exactly the calls
+that were recorded and leaves the database untouched.
+
+Usage: record once with live access, then profile or regression-test offline,
+e.g.  FIXTURE_MODE=replay python test.py
+"""
+
+import hashlib
+import json
+import os
+from datetime import datetime
+from typing import Any, Callable, Optional
+
+MODE = os.getenv("FIXTURE_MODE", "").strip().lower()
+_DIR = os.getenv("FIXTURE_DIR", os.path.join("data", "fixtures"))
+
+if MODE not in ("", "record", "replay"):
+    print(f"[Fixtures] Unknown FIXTURE_MODE '{MODE}', ignoring.")
+    MODE = ""
+
+
+class FixtureMissing(RuntimeError):
+    """Replay mode was asked for a call that was never recorded."""
+
+
+def recording() -> bool:
+    return MODE == "record"
+
+
+def replaying() -> bool:
+    return MODE == "replay"
+
+
+def active() -> bool:
+    """True while recording or replaying."""
+    return MODE != ""
+
+
+# ── JSON with datetimes (google-play-scraper returns them) ───────────────
+class _Encoder(json.JSONEncoder):
+    def default(self, o):
+        if isinstance(o, datetime):
+            return {"__datetime__": o.isoformat()}
+        return super().default(o)
+
+
+def _decode_hook(obj: dict):
+    if set(obj) == {"__datetime__"}:
+        return datetime.fromisoformat(obj["__datetime__"])
+    return obj
+
+
+def _path(kind: str, parts: list) -> str:
+    digest = hashlib.sha256(
+        json.dumps(parts, sort_keys=True, cls=_Encoder).encode("utf-8")
+    ).hexdigest()[:32]
+    return os.path.join(_DIR, kind, f"{digest}.json")
+
+
+def load(kind: str, parts: list) -> Any:
+    path = _path(kind, parts)
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f, object_hook=_decode_hook)["response"]
+    except FileNotFoundError:
+        raise FixtureMissing(f"No {kind} fixture for {json.dumps(parts, cls=_Encoder)[:120]}")
+
+
+def save(kind: str, parts: list, payload: Any) -> None:
+    path = _path(kind, parts)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"request": parts, "response": payload}, f,
+                      cls=_Encoder, ensure_ascii=False, indent=1)
+    except OSError as e:
+        print(f"[Fixtures] Could not record {kind} fixture: {e}")
+
+
+def through(kind: str, parts: list, call: Callable[[], Any],
+            encode: Optional[Callable[[Any], Any]] = None,
+            decode: Optional[Callable[[Any], Any]] = None) -> Any:
+    """
+    Run `call` according to FIXTURE_MODE. `encode` turns its result into
+    JSON-able data for recording; `decode` turns a recorded payload back.
+    Both default to identity.
+    """
+    if replaying():
+        payload = load(kind, parts)
+        return decode(payload) if decode else payload
+
+    result = call()
+    if recording():
+        save(kind, parts, encode(result) if encode else result)
+    return result
@@ -0,0 +1,143 @@
+"""
+On-disk HTTP response cache for http_client.
+
+Successful GET responses are stored in a small SQLite file under data/,
+keyed by the full request URL (query string included). Within the host's
+TTL a cached response is served with no network at all; after that the
+stored ETag / Last-Modified are sent as a conditional request, and a 304
+refreshes the entry instead of re-downloading the body.
+
+Enabled by default; set HTTP_CACHE=0 to disable. TTLs can be overridden
+per host suffix, e.g. HTTP_CACHE_TTLS="reddit.com=300,itunes.apple.com=3600".
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+_ENABLED = os.getenv("HTTP_CACHE", "1") not in ("0", "false", "no")
+_PATH    = os.getenv("HTTP_CACHE_PATH", os.path.join("data", "http_cache.db"))
+
+# (host suffix, seconds a cached response is served without revalidation)
+_DEFAULT_TTLS = {
+    "reddit.com":       600,    # search JSON moves slowly at sort=new&t=month
+    "itunes.apple.com": 1800,   # RSS review pages and search results
+}
+_FALLBACK_TTL = 300
+
+# Body is stored already decoded, so these no longer describe it
+_DROP_HEADERS = {"content-encoding", "content-length", "transfer-encoding", "connection"}
+
+
+def _load_ttls() -> dict:
+    ttls = dict(_DEFAULT_TTLS)
+    for pair in os.getenv("HTTP_CACHE_TTLS", "").split(","):
+        host, _, seconds = pair.partition("=")
+        if host.strip() and seconds.strip().isdigit():
+            ttls[host.strip().lower()] = int(seconds)
+    return ttls
+
+
+_TTLS = _load_ttls()
+_conn: Optional[sqlite3.Connection] = None
+_lock = threading.Lock()
+
+
+def enabled() -> bool:
+    return _ENABLED
+
+
+def ttl_for(host: str) -> int:
+    host = host.lower().split(":")[0]
+    for suffix, ttl in _TTLS.items():
+        if host == suffix or host.endswith("." + suffix):
+            return ttl
+    return _FALLBACK_TTL
+
+
+def _connection() -> sqlite3.Connection:
+    global _conn
+    if _conn is None:
+        os.makedirs(os.path.dirname(_PATH) or ".", exist_ok=True)
+        _conn = sqlite3.connect(_PATH, check_same_thread=False)
+        _conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " url TEXT PRIMARY KEY,"
+            " status INTEGER NOT NULL,"
+            " headers TEXT NOT NULL,"
+            " body BLOB NOT NULL,"
+            " stored_at REAL NOT NULL)"
+        )
+        _conn.commit()
+    return _conn
+
+
+def lookup(url: str) -> Optional[dict]:
+    """
+    Return the cached entry for a URL as
+    {"status", "headers", "body", "age"} or None. Errors count as a miss.
+    """
+    try:
+        with _lock:
+            row = _connection().execute(
+                "SELECT status, headers, body, stored_at FROM responses WHERE url = ?",
+                (url,),
+            ).fetchone()
+    except sqlite3.Error as e:
+        print(f"[HTTPCache] Lookup failed: {e}")
+        return None
+    if row is None:
+        return None
+    status, headers, body, stored_at = row
+    return {
+        "status":  status,
+        "headers": json.loads(headers),
+        "body":    body,
+        "age":     time.time() - stored_at,
+    }
+
+
+def storable_headers(headers) -> dict:
+    """Response headers minus the ones that describe the on-the-wire encoding."""
+    return {k: v for k, v in headers.items() if k.lower() not in _DROP_HEADERS}
+
+
+def store(url: str, status: int, headers, body: bytes) -> None:
+    """Insert or replace a response. Only call for cacheable (200) responses."""
+    kept = storable_headers(headers)
+    try:
+        with _lock:
+            conn = _connection()
+            conn.execute(
+                "INSERT OR REPLACE INTO responses (url, status, headers, body, stored_at)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (url, status, json.dumps(kept), body, time.time()),
+            )
+            conn.commit()
+    except sqlite3.Error as e:
+        print(f"[HTTPCache] Store failed: {e}")
+
+
+def touch(url: str) -> None:
+    """Mark an entry fresh again after a 304 revalidation."""
+    try:
+        with _lock:
+            conn = _connection()
+            conn.execute("UPDATE responses SET stored_at = ? WHERE url = ?", (time.time(), url))
+            conn.commit()
+    except sqlite3.Error as e:
+        print(f"[HTTPCache] Touch failed: {e}")
+
+
+def validators(entry: dict) -> dict:
+    """Conditional-request headers for a stale entry (may be empty)."""
+    headers = {}
+    lowered = {k.lower(): v for k, v in entry["headers"].items()}
+    if lowered.get("etag"):
+        headers["If-None-Match"] = lowered["etag"]
+    if lowered.get("last-modified"):
+        headers["If-Modified-Since"] = lowered["last-modified"]
+    return headers
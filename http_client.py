@@ -0,0 +1,177 @@
+"""
+Shared HTTP client for every outbound scraper / discovery request.
+
+One pooled `httpx.Client` per host keeps TCP+TLS connections alive across
+pages and terms instead of re-handshaking on every call. HTTP/2 is used
+when the optional `h2` package is installed and the host negotiates it.
+
+All callers go through get(), which takes a token from the host's
+rate_limiter bucket before every attempt, applies shared timeouts and
+retries 429 / 5xx responses with jittered exponential backoff. Retry-After
+and x-ratelimit-* headers are fed back to the limiter, so the pause they
+ask for applies to every thread talking to that host.
+
+Underneath sits http_cache: fresh cached responses skip the network (and
+the limiter) entirely, stale ones are revalidated with ETag/Last-Modified.
+Above it sits the fixtures record/replay switch (FIXTURE_MODE).
+"""
+
+import random
+import threading
+import time
+from typing import Optional
+from urllib.parse import urlsplit
+
+import httpx
+
+import fixtures
+import http_cache
+import metrics
+import rate_limiter
+
+try:
+    import h2  # noqa: F401 — only needed to enable HTTP/2 negotiation
+    _HTTP2 = True
+except ImportError:
+    _HTTP2 = False
+
+_DEFAULT_HEADERS = {"User-Agent": "discovery-engine/1.0 (signal-collector)"}
+_TIMEOUT         = httpx.Timeout(10.0, connect=5.0)
+_LIMITS          = httpx.Limits(max_connections=10, max_keepalive_connections=5, keepalive_expiry=30)
+
+_RETRY_STATUSES  = {429, 500, 502, 503, 504}
+_MAX_RETRIES     = 3
+_BACKOFF_BASE    = 0.5    # seconds; doubles each attempt
+_BACKOFF_MAX     = 8.0    # never sleep longer than this between attempts
+
+_clients: dict = {}
+_clients_lock = threading.Lock()
+
+
+def _client_for(host: str) -> httpx.Client:
+    """Return the pooled client for a host, creating it on first use."""
+    with _clients_lock:
+        client = _clients.get(host)
+        if client is None:
+            client = httpx.Client(
+                http2=_HTTP2,
+                timeout=_TIMEOUT,
+                limits=_LIMITS,
+                headers=_DEFAULT_HEADERS,
+                follow_redirects=True,
+            )
+            _clients[host] = client
+        return client
+
+
+def _retry_delay(resp: Optional[httpx.Response], attempt: int) -> float:
+    """
+    Backoff before the next attempt. When the host sent Retry-After the
+    rate limiter already holds the host for that long, so no extra sleep.
+    """
+    if resp is not None and resp.headers.get("Retry-After"):
+        return 0.0
+    delay = _BACKOFF_BASE * (2 ** attempt)
+    return min(delay + random.uniform(0, delay / 2), _BACKOFF_MAX)
+
+
+def _send(client: httpx.Client, host: str, url: str, headers: Optional[dict],
+          timeout: Optional[float]) -> httpx.Response:
+    """Rate-limited GET with retry/backoff on 429, 5xx and transport errors."""
+    kwargs = {"headers": headers}
+    if timeout is not None:
+        kwargs["timeout"] = timeout
+
+    for attempt in range(_MAX_RETRIES + 1):
+        resp = None
+        rate_limiter.acquire(host)
+        try:
+            resp = client.get(url, **kwargs)
+            rate_limiter.observe(host, resp.status_code, resp.headers)
+            if resp.status_code not in _RETRY_STATUSES or attempt == _MAX_RETRIES:
+                return resp
+        except httpx.TransportError:
+            if attempt == _MAX_RETRIES:
+                raise
+
+        delay = _retry_delay(resp, attempt)
+        print(f"[HTTP] {resp.status_code if resp is not None else 'network error'} "
+              f"for {url[:80]} — retry {attempt + 1}/{_MAX_RETRIES} in {delay:.1f}s")
+        if delay:
+            time.sleep(delay)
+
+
+def _from_cache(url: str, entry: dict) -> httpx.Response:
+    return httpx.Response(
+        status_code=entry["status"],
+        headers=entry["headers"],
+        content=entry["body"],
+        request=httpx.Request("GET", url),
+    )
+
+
+def _encode_fixture(resp: httpx.Response) -> dict:
+    return {
+        "status":  resp.status_code,
+        "headers": http_cache.storable_headers(resp.headers),
+        "text":    resp.text,
+    }
+
+
+def _decode_fixture(url: str, payload: dict) -> httpx.Response:
+    return httpx.Response(
+        status_code=payload["status"],
+        headers=payload["headers"],
+        content=payload["text"].encode("utf-8"),
+        request=httpx.Request("GET", url),
+    )
+
+
+def get(url: str, params: Optional[dict] = None, headers: Optional[dict] = None,
+        timeout: Optional[float] = None) -> httpx.Response:
+    """
+    GET through the pooled client for the URL's host.
+
+    Returns the final response (which may still be a 429/5xx once retries are
+    exhausted). Raises httpx.HTTPError only if the last attempt failed at the
+    transport level — callers already treat any exception as "no data".
+    """
+    full_url = str(httpx.URL(url, params=params)) if params else url
+    return fixtures.through(
+        "http", [full_url],
+        lambda: _get_live(full_url, headers, timeout),
+        encode=_encode_fixture,
+        decode=lambda payload: _decode_fixture(full_url, payload),
+    )
+
+
+def _get_live(full_url: str, headers: Optional[dict], timeout: Optional[float]) -> httpx.Response:
+    host = urlsplit(full_url).netloc.lower()
+    client = _client_for(host)
+    start = time.perf_counter()
+
+    cached = http_cache.lookup(full_url) if http_cache.enabled() else None
+    if cached is not None:
+        if cached["age"] < http_cache.ttl_for(host):
+            metrics.record_http(time.perf_counter() - start, cached=True)
+            return _from_cache(full_url, cached)
+        headers = {**(headers or {}), **http_cache.validators(cached)}
+
+    resp = _send(client, host, full_url, headers, timeout)
+
+    if cached is not None and resp.status_code == 304:
+        http_cache.touch(full_url)
+        metrics.record_http(time.perf_counter() - start, cached=True)
+        return _from_cache(full_url, cached)
+    metrics.record_http(time.perf_counter() - start)
+    if http_cache.enabled() and resp.status_code == 200:
+        http_cache.store(full_url, resp.status_code, resp.headers, resp.content)
+    return resp
+
+
+def close_all() -> None:
+    """Close every pooled client (e.g. on server shutdown)."""
+    with _clients_lock:
+        for client in _clients.values():
+            client.close()
+        _clients.clear()
@@ -1,6 +1,5 @@
-from db import engine
-from models import Base
+from db import init_schema
 
-Base.metadata.create_all(bind=engine)
+init_schema()
 
 print("Database tables created successfully.")
\ No newline at end of file
@@ -0,0 +1,94 @@
+"""
+Incremental parser for a JSON array arriving in pieces.
+
+    parser = JsonArrayStream()
+    for chunk in llm_gateway.stream_text(...):
+        for item in parser.feed(chunk):
+            ...   # each top-level element, as soon as it is complete
+
+Text before the opening "[" (preamble, markdown fences) is skipped. Each
+top-level element is decoded once its closing bracket / comma arrives, so a
+response cut off by max_tokens still yields every element that completed.
+"""
+
+import json
+
+
+class JsonArrayStream:
+    def __init__(self):
+        self._buffer = ""
+        self._pos = 0              # next character to scan
+        self._started = False      # seen the array's "["
+        self._done = False         # seen the array's "]"
+        self._depth = 0            # nesting inside the current element
+        self._item_start = None    # buffer index where the current element began
+        self._in_string = False
+        self._escaped = False
+
+    @property
+    def done(self) -> bool:
+        return self._done
+
+    def feed(self, chunk: str) -> list:
+        """Add text; return the top-level elements completed by it."""
+        if self._done or not chunk:
+            return []
+        self._buffer += chunk
+        items = []
+        buf = self._buffer
+        i = self._pos
+        while i < len(buf) and not self._done:
+            ch = buf[i]
+            if not self._started:
+                if ch == "[":
+                    self._started = True
+                i += 1
+                continue
+
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif ch == "\\":
+                    self._escaped = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+                if self._item_start is None:
+                    self._item_start = i
+            elif ch in "[{":
+                if self._item_start is None:
+                    self._item_start = i
+                self._depth += 1
+            elif ch in "]}":
+                if self._depth == 0:
+                    # The array's own "]"
+                    self._emit(buf[self._item_start:i] if self._item_start is not None else "", items)
+                    self._item_start = None
+                    self._done = True
+                else:
+                    self._depth -= 1
+            elif ch == "," and self._depth == 0:
+                self._emit(buf[self._item_start:i] if self._item_start is not None else "", items)
+                self._item_start = None
+            elif not ch.isspace() and self._item_start is None:
+                self._item_start = i   # number / true / false / null
+            i += 1
+
+        # Drop what is no longer needed, keeping any element in progress
+        keep = self._item_start if self._item_start is not None else i
+        self._buffer = buf[keep:]
+        self._pos = i - keep
+        if self._item_start is not None:
+            self._item_start = 0
+        return items
+
+    @staticmethod
+    def _emit(text: str, items: list) -> None:
+        text = text.strip()
+        if not text:
+            return
+        try:
+            items.append(json.loads(text))
+        except ValueError as e:
+            print(f"[JSONStream] Skipping malformed element: {e}")
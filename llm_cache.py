@@ -0,0 +1,105 @@
+"""
+Content-addressed cache for model responses.
+
+Every synthesizer call runs at temperature=0, so an identical request
+(model, temperature, max_tokens, system, messages) gets the same answer.
+Responses are stored in a local SQLite file under data/, keyed by a SHA-256
+of that request, so re-running /analyze for the same product skips the
+round trips entirely.
+
+Entries expire after LLM_CACHE_TTL seconds (default 7 days). The file is
+kept to LLM_CACHE_MAX_ENTRIES rows by evicting the least recently used.
+Set LLM_CACHE=0 to disable.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+_ENABLED     = os.getenv("LLM_CACHE", "1") not in ("0", "false", "no")
+_PATH        = os.getenv("LLM_CACHE_PATH", os.path.join("data", "llm_cache.db"))
+_TTL         = int(os.getenv("LLM_CACHE_TTL", str(7 * 24 * 3600)))
+_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "5000"))
+
+_KEY_FIELDS = ("model", "temperature", "max_tokens", "system", "messages")
+
+_conn: Optional[sqlite3.Connection] = None
+_lock = threading.Lock()
+
+
+def cacheable(request: dict) -> bool:
+    """Only deterministic (temperature 0) requests are safe to reuse."""
+    return _ENABLED and request.get("temperature") == 0
+
+
+def make_key(request: dict) -> str:
+    material = {field: request.get(field) for field in _KEY_FIELDS}
+    return hashlib.sha256(
+        json.dumps(material, sort_keys=True, ensure_ascii=False).encode("utf-8")
+    ).hexdigest()
+
+
+def _connection() -> sqlite3.Connection:
+    global _conn
+    if _conn is None:
+        os.makedirs(os.path.dirname(_PATH) or ".", exist_ok=True)
+        _conn = sqlite3.connect(_PATH, check_same_thread=False)
+        _conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY,"
+            " model TEXT NOT NULL,"
+            " payload TEXT NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " last_used REAL NOT NULL)"
+        )
+        _conn.commit()
+    return _conn
+
+
+def lookup(key: str) -> Optional[dict]:
+    """Return the stored response payload, or None on miss / expiry / error."""
+    now = time.time()
+    try:
+        with _lock:
+            conn = _connection()
+            row = conn.execute(
+                "SELECT payload, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            payload, created_at = row
+            if now - created_at > _TTL:
+                conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                conn.commit()
+                return None
+            conn.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+            conn.commit()
+    except sqlite3.Error as e:
+        print(f"[LLMCache] Lookup failed: {e}")
+        return None
+    return json.loads(payload)
+
+
+def store(key: str, model: str, payload: dict) -> None:
+    """Insert a response and evict least-recently-used rows beyond the size bound."""
+    now = time.time()
+    try:
+        with _lock:
+            conn = _connection()
+            conn.execute(
+                "INSERT OR REPLACE INTO responses (key, model, payload, created_at, last_used)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (key, model, json.dumps(payload), now, now),
+            )
+            conn.execute(
+                "DELETE FROM responses WHERE key IN ("
+                " SELECT key FROM responses ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (_MAX_ENTRIES,),
+            )
+            conn.commit()
+    except sqlite3.Error as e:
+        print(f"[LLMCache] Store failed: {e}")
@@ -0,0 +1,266 @@
+"""
+Process-wide gateway for every model call.
+
+Call sites name a model tier (classify, cluster, insights, enrich); the
+tier resolves to a model through config.LLM_MODEL_TIERS for the configured
+provider (llm_providers: the Anthropic API, or a deterministic local backend
+for load tests). The Anthropic provider keeps one pooled client per API key.
+create_message() layers, from the outside in:
+
+  fixtures   FIXTURE_MODE record / replay ("llm" kind)
+  llm_cache  identical temperature-0 requests served from data/llm_cache.db
+  semaphores at most LLM_CONCURRENCY_PER_KEY requests in flight per API key
+             and LLM_MAX_CONCURRENCY process-wide
+  retries    429 / 529 / 5xx and connection errors, jittered exponential
+             backoff, honouring Retry-After
+  timeout    per model family (_MODEL_TIMEOUTS)
+
+The SDK's own retries are switched off so this policy is the only one.
+The local provider skips fixtures and the cache, and persistent() tells
+callers not to store its answers anywhere longer-lived either.
+
+stream_text() is the streaming variant: it yields response text as it
+arrives, shares the same fixtures and cache entries as create_message(), and
+only retries failures that happen before the first text arrives.
+"""
+
+import os
+import random
+import threading
+import time
+
+import anthropic
+import httpx
+from anthropic.types import Message
+
+import fixtures
+import llm_cache
+import metrics
+from config import LLM_MODEL_TIERS, LLM_PROVIDER
+from llm_providers import AnthropicProvider, LocalProvider
+
+_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+_PER_KEY_CONCURRENCY = int(os.getenv("LLM_CONCURRENCY_PER_KEY", "4"))
+_LIMITS          = httpx.Limits(max_connections=_MAX_CONCURRENCY * 2,
+                                max_keepalive_connections=_MAX_CONCURRENCY,
+                                keepalive_expiry=60)
+
+# model prefix -> request timeout in seconds (first match wins)
+_MODEL_TIMEOUTS = {
+    "claude-3-haiku": 60.0,
+    "claude-3-5-haiku": 60.0,
+    "claude-3-5-sonnet": 120.0,
+    "claude-3-opus": 180.0,
+}
+_DEFAULT_TIMEOUT = 120.0
+_CONNECT_TIMEOUT = 5.0
+
+_RETRY_STATUSES = {429, 500, 502, 503, 504, 529}
+_MAX_RETRIES    = 3
+_BACKOFF_BASE   = 1.0    # seconds; doubles each attempt
+_BACKOFF_MAX    = 20.0
+
+if LLM_PROVIDER not in LLM_MODEL_TIERS:
+    print(f"[LLM] Unknown LLM_PROVIDER '{LLM_PROVIDER}', using anthropic.")
+_PROVIDER_NAME = LLM_PROVIDER if LLM_PROVIDER in LLM_MODEL_TIERS else "anthropic"
+_provider = LocalProvider() if _PROVIDER_NAME == "local" else AnthropicProvider(_LIMITS)
+
+_slots = threading.BoundedSemaphore(_MAX_CONCURRENCY)
+_key_slots: dict = {}
+_key_slots_lock = threading.Lock()
+_in_flight = 0
+_in_flight_lock = threading.Lock()
+
+
+def available() -> bool:
+    """True when model calls can be served: a usable provider, or replayed fixtures."""
+    return _provider.available() or fixtures.replaying()
+
+
+def persistent() -> bool:
+    """False when answers are stand-ins (local provider) that must not be stored."""
+    return _provider.persistent
+
+
+def close() -> None:
+    """Close the provider's pooled clients (e.g. on server shutdown)."""
+    _provider.close()
+
+
+def _key_slot() -> threading.BoundedSemaphore:
+    key = _provider.key()
+    with _key_slots_lock:
+        if key not in _key_slots:
+            _key_slots[key] = threading.BoundedSemaphore(_PER_KEY_CONCURRENCY)
+        return _key_slots[key]
+
+
+def in_flight() -> int:
+    """Number of model requests currently on the wire."""
+    return _in_flight
+
+
+def model_for(tier: str) -> str:
+    """Model name a tier resolves to under the active provider."""
+    tiers = LLM_MODEL_TIERS[_PROVIDER_NAME]
+    if tier not in tiers:
+        raise ValueError(f"Unknown model tier '{tier}'")
+    return os.getenv(f"LLM_MODEL_{tier.upper()}") or tiers[tier]
+
+
+def _timeout_for(model: str) -> httpx.Timeout:
+    for prefix, seconds in _MODEL_TIMEOUTS.items():
+        if model.startswith(prefix):
+            return httpx.Timeout(seconds, connect=_CONNECT_TIMEOUT)
+    return httpx.Timeout(_DEFAULT_TIMEOUT, connect=_CONNECT_TIMEOUT)
+
+
+def _retry_delay(error: Exception, attempt: int) -> float:
+    response = getattr(error, "response", None)
+    if response is not None:
+        retry_after = response.headers.get("retry-after")
+        if retry_after:
+            try:
+                return min(float(retry_after), _BACKOFF_MAX)
+            except ValueError:
+                pass
+    backoff = min(_BACKOFF_BASE * (2 ** attempt), _BACKOFF_MAX)
+    return backoff / 2 + random.uniform(0, backoff / 2)
+
+
+def _retryable(error: Exception) -> bool:
+    if isinstance(error, (anthropic.APIConnectionError, anthropic.APITimeoutError)):
+        return True
+    return isinstance(error, anthropic.APIStatusError) and error.status_code in _RETRY_STATUSES
+
+
+def _send(tier: str, kwargs: dict) -> Message:
+    global _in_flight
+    timeout = _timeout_for(kwargs.get("model", ""))
+    attempt = 0
+    start = time.perf_counter()
+    while True:
+        try:
+            # Key slot first, so a call queued behind its own key holds no global slot
+            with _key_slot(), _slots:
+                with _in_flight_lock:
+                    _in_flight += 1
+                try:
+                    response = _provider.create(tier, kwargs, timeout)
+                    metrics.record_llm(kwargs["model"], response.usage, time.perf_counter() - start)
+                    return response
+                finally:
+                    with _in_flight_lock:
+                        _in_flight -= 1
+        except Exception as e:
+            if attempt >= _MAX_RETRIES or not _retryable(e):
+                raise
+            delay = _retry_delay(e, attempt)
+            print(f"[LLM] {type(e).__name__} on {kwargs.get('model')}, "
+                  f"retry {attempt + 1}/{_MAX_RETRIES} in {delay:.1f}s")
+            time.sleep(delay)   # outside the semaphore, so waiting frees a slot
+            attempt += 1
+
+
+def _cache_key(kwargs: dict):
+    if _provider.cacheable and llm_cache.cacheable(kwargs):
+        return llm_cache.make_key(kwargs)
+    return None
+
+
+def create_message(tier: str, **kwargs) -> Message:
+    """messages.create() for a model tier, through fixtures, cache, concurrency limit and retries."""
+    kwargs = {"model": model_for(tier), **kwargs}
+    if not _provider.cacheable:
+        return _send(tier, kwargs)
+
+    def _live():
+        key = _cache_key(kwargs)
+        if key:
+            cached = llm_cache.lookup(key)
+            if cached is not None:
+                metrics.record_llm(kwargs["model"], cached=True)
+                return Message.model_validate(cached)
+
+        response = _send(tier, kwargs)
+
+        if key:
+            llm_cache.store(key, kwargs.get("model", ""), response.model_dump(mode="json"))
+        return response
+
+    return fixtures.through(
+        "llm", [kwargs],
+        _live,
+        encode=lambda response: response.model_dump(mode="json"),
+        decode=Message.model_validate,
+    )
+
+
+def _stream_live(tier: str, kwargs: dict):
+    """Yield text deltas from a live streamed call; returns the final Message."""
+    global _in_flight
+    timeout = _timeout_for(kwargs.get("model", ""))
+    attempt = 0
+    start = time.perf_counter()
+    while True:
+        started = False
+        try:
+            with _key_slot(), _slots:
+                with _in_flight_lock:
+                    _in_flight += 1
+                try:
+                    with _provider.stream(tier, kwargs, timeout) as stream:
+                        for text in stream.text_stream:
+                            started = True
+                            yield text
+                        final = stream.get_final_message()
+                        metrics.record_llm(kwargs["model"], final.usage, time.perf_counter() - start)
+                        return final
+                finally:
+                    with _in_flight_lock:
+                        _in_flight -= 1
+        except Exception as e:
+            # Text already handed out cannot be taken back, so no retry then
+            if started or attempt >= _MAX_RETRIES or not _retryable(e):
+                raise
+            delay = _retry_delay(e, attempt)
+            print(f"[LLM] {type(e).__name__} on {kwargs.get('model')} stream, "
+                  f"retry {attempt + 1}/{_MAX_RETRIES} in {delay:.1f}s")
+            time.sleep(delay)
+            attempt += 1
+
+
+def _message_text(message: Message) -> str:
+    return "".join(block.text for block in message.content if block.type == "text")
+
+
+def stream_text(tier: str, **kwargs):
+    """
+    Yield the response text for a model tier incrementally. Replayed fixtures
+    and cache hits arrive as a single chunk; live responses are recorded /
+    cached once the stream completes.
+    """
+    kwargs = {"model": model_for(tier), **kwargs}
+    if not _provider.cacheable:
+        yield from _stream_live(tier, kwargs)
+        return
+
+    if fixtures.replaying():
+        yield _message_text(Message.model_validate(fixtures.load("llm", [kwargs])))
+        return
+
+    key = _cache_key(kwargs)
+    cached = llm_cache.lookup(key) if key else None
+    if cached is not None:
+        metrics.record_llm(kwargs["model"], cached=True)
+        yield _message_text(Message.model_validate(cached))
+        payload = cached
+    else:
+        final = yield from _stream_live(tier, kwargs)
+        payload = final.model_dump(mode="json")
+        if key:
+            llm_cache.store(key, kwargs.get("model", ""), payload)
+
+    # Cache hits are recorded too, as fixtures.through() does for create_message()
+    if fixtures.recording():
+        fixtures.save("llm", [kwargs], payload)
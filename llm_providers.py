@@ -0,0 +1,228 @@
+"""
+LLM providers behind llm_gateway.
+
+Both expose the same two calls, shaped like the Anthropic SDK so the gateway
+treats them alike:
+
+  create(tier, kwargs, timeout) -> Message
+  stream(tier, kwargs, timeout) -> context manager with .text_stream and
+                                   .get_final_message()
+
+anthropic  the real API (one pooled client per API key)
+local      deterministic, offline, schema-valid answers for every tier with
+           injected latency — for load-testing the server and benchmarking
+           the pipeline without API spend. Latency per call is
+           LOCAL_LLM_LATENCY_MS (time to first token, default 400) plus
+           LOCAL_LLM_MS_PER_TOKEN (default 8) per output token.
+
+Select with LLM_PROVIDER=anthropic|local (see config.LLM_PROVIDER).
+"""
+
+import json
+import os
+import re
+import threading
+import time
+
+import httpx
+from anthropic import Anthropic
+from anthropic.types import Message
+
+import local_cluster
+
+
+class AnthropicProvider:
+    name = "anthropic"
+    cacheable = True
+    persistent = True
+
+    def __init__(self, limits: httpx.Limits):
+        self._limits = limits
+        self._clients: dict = {}
+        self._lock = threading.Lock()
+
+    def available(self) -> bool:
+        return bool(os.getenv("ANTHROPIC_API_KEY"))
+
+    def key(self) -> str:
+        """Identity that rate limits apply to: the API key."""
+        return os.getenv("ANTHROPIC_API_KEY") or ""
+
+    def close(self) -> None:
+        with self._lock:
+            for client in self._clients.values():
+                client.close()
+            self._clients.clear()
+
+    def _client(self) -> Anthropic:
+        api_key = self.key()
+        with self._lock:
+            client = self._clients.get(api_key)
+            if client is None:
+                client = Anthropic(
+                    api_key=api_key,
+                    max_retries=0,
+                    http_client=httpx.Client(limits=self._limits),
+                )
+                self._clients[api_key] = client
+            return client
+
+    def create(self, tier: str, kwargs: dict, timeout) -> Message:
+        return self._client().messages.create(**kwargs, timeout=timeout)
+
+    def stream(self, tier: str, kwargs: dict, timeout):
+        return self._client().messages.stream(**kwargs, timeout=timeout)
+
+
+# ==========================================================
+# LOCAL (deterministic) BACKEND
+# ==========================================================
+_NEGATIVE_WORDS = (
+    "crash", "bug", "glitch", "freeze", "slow", "lag", "broken", "error",
+    "not working", "doesn't work", "can't", "cannot", "won't", "unable", "issue",
+    "problem", "fix", "annoying", "worst", "terrible", "horrible", "refund",
+    "scam", "ads", "hate", "useless", "expensive",
+)
+_POSITIVE_WORDS = (
+    "love", "great", "awesome", "excellent", "amazing", "perfect", "best",
+    "good", "nice", "helpful", "easy", "recommend",
+)
+_ITEM_LINE = re.compile(r"^(\d+)\.\s?(.*)$")
+_THEME_LINE = re.compile(r"^- (.+?) \(freq")
+
+
+def _lines(prompt: str) -> list:
+    """(index, text) pairs from the "N. text" item list a prompt ends with."""
+    items = []
+    for line in prompt.splitlines():
+        match = _ITEM_LINE.match(line.strip())
+        if match:
+            items.append((int(match.group(1)), match.group(2)))
+    return items
+
+
+def _local_classify(prompt: str) -> str:
+    out = []
+    for idx, text in _lines(prompt):
+        lowered = text.lower()
+        negative = any(w in lowered for w in _NEGATIVE_WORDS)
+        positive = any(w in lowered for w in _POSITIVE_WORDS)
+        sentiment = "mixed" if negative and positive else "positive" if positive else "negative"
+        out.append({"id": idx, "sentiment": sentiment})
+    return json.dumps(out)
+
+
+def _local_cluster(prompt: str) -> str:
+    items = _lines(prompt)
+    signals = [{"text": text} for _, text in items]
+    themes = local_cluster.cluster_indices(signals, k=min(6, max(1, len(signals) // 10)))
+    return json.dumps([
+        {
+            "name": t["name"],
+            "indices": [items[i][0] for i in t["indices"]],
+            "emotional_intensity": t["emotional_intensity"],
+            "primary_segment": "General",
+        }
+        for t in themes
+    ])
+
+
+def _local_insights(prompt: str) -> str:
+    names = [m.group(1) for m in map(_THEME_LINE.match, prompt.splitlines()) if m]
+    return json.dumps({
+        "core_painpoints":          [n for n in names[:4]],
+        "critical_bottlenecks":     [f"{n} blocking core tasks" for n in names[:2]],
+        "user_frustration_drivers": [f"Recurring {n.lower()}" for n in names[:3]],
+        "retention_risk_areas":     [f"Churn from {n.lower()}" for n in names[:2]],
+    })
+
+
+def _local_enrich(prompt: str) -> str:
+    product = prompt.rsplit("Product:", 1)[-1].strip() or "The product"
+    if '"valid"' in prompt:
+        return json.dumps({
+            "valid": True,
+            "category": "Other",
+            "context": f"- {product}: digital product (local provider, no live knowledge)",
+        })
+    return "Other"
+
+
+_LOCAL_TIERS = {
+    "classify": _local_classify,
+    "cluster":  _local_cluster,
+    "insights": _local_insights,
+    "enrich":   _local_enrich,
+}
+
+
+class _LocalStream:
+    """Mimics the SDK's MessageStream: text_stream, then get_final_message()."""
+
+    def __init__(self, message: Message, seconds_per_chunk: float):
+        self._message = message
+        self._seconds_per_chunk = seconds_per_chunk
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    @property
+    def text_stream(self):
+        text = self._message.content[0].text
+        for i in range(0, len(text), 16):
+            time.sleep(self._seconds_per_chunk)
+            yield text[i:i + 16]
+
+    def get_final_message(self) -> Message:
+        return self._message
+
+
+class LocalProvider:
+    name = "local"
+    cacheable = False   # answers are free and deterministic already
+    persistent = False  # stand-in answers must not land in stored profiles / memos
+
+    def __init__(self):
+        self._first_token = float(os.getenv("LOCAL_LLM_LATENCY_MS", "400")) / 1000
+        self._per_token = float(os.getenv("LOCAL_LLM_MS_PER_TOKEN", "8")) / 1000
+
+    def available(self) -> bool:
+        return True
+
+    def key(self) -> str:
+        return "local"
+
+    def close(self) -> None:
+        pass
+
+    def _answer(self, tier: str, kwargs: dict) -> Message:
+        prompt = kwargs["messages"][-1]["content"]
+        text = _LOCAL_TIERS.get(tier, _local_enrich)(prompt)
+        output_tokens = len(text) // 4 + 1
+        max_tokens = kwargs.get("max_tokens", output_tokens)
+        stop = "end_turn"
+        if output_tokens > max_tokens:
+            text, output_tokens, stop = text[:max_tokens * 4], max_tokens, "max_tokens"
+        return Message.model_validate({
+            "id": "local",
+            "type": "message",
+            "role": "assistant",
+            "model": kwargs.get("model", "local"),
+            "content": [{"type": "text", "text": text}],
+            "stop_reason": stop,
+            "stop_sequence": None,
+            "usage": {"input_tokens": len(prompt) // 4 + 1, "output_tokens": output_tokens},
+        })
+
+    def create(self, tier: str, kwargs: dict, timeout) -> Message:
+        message = self._answer(tier, kwargs)
+        time.sleep(self._first_token + self._per_token * message.usage.output_tokens)
+        return message
+
+    def stream(self, tier: str, kwargs: dict, timeout):
+        message = self._answer(tier, kwargs)
+        time.sleep(self._first_token)
+        return _LocalStream(message, self._per_token * 4)   # 16-char chunks ≈ 4 tokens
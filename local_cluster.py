@@ -0,0 +1,334 @@
+"""
+Local theme clustering — no API key, no network.
+
+Signals are turned into TF-IDF vectors over unigrams and adjacent-word
+bigrams (vocabulary capped at _MAX_FEATURES by document frequency), then
+grouped with spherical k-means (cosine similarity, k-means++ seeding with a
+fixed seed, so output is deterministic). Each cluster is labelled with its
+centroid's top terms; emotional intensity comes from a small complaint
+lexicon plus shouting cues ("!!", ALL CAPS).
+
+Used when no model is available, for clustering chunks whose model call
+failed, for merging the per-chunk themes of a map-reduce clustering run
+(merge_themes), and as a cheap baseline to compare LLM themes against. Themes have
+the same shape as synthesizer.cluster_themes output. 10k signals take about
+0.5s at ~250 characters each, 0.9s at ~600 and 2s at ~2,000 (the scraper
+cap); the single regex pass per text and k-means dominate.
+"""
+
+import math
+import re
+from collections import Counter
+
+import numpy as np
+
+_MAX_FEATURES = 1000
+_MIN_DF       = 2
+_MAX_DF_RATIO = 0.5     # terms in more than half the signals say nothing
+_MAX_K        = 6
+_ITERATIONS   = 25
+_LABEL_TERMS  = 3
+_SEED         = 0
+_MERGE_SIMILARITY = 0.3   # centroid cosine at which two partial themes are one
+_NAME_WEIGHT      = 0.5   # pull of a theme's name on its centroid
+
+_WORD_RE = re.compile(r"[a-z][a-z']{2,}")
+_CAPS_RUN_RE = re.compile(r"[^\sa-z]{4}")
+_STOPWORDS = set("""
+the and for that this with have has had was were are but not you your they them their
+its it's from just like get got can could would should will been being all any some
+what when where which who why how about into out over than then there here very really
+also even still only much more most many other such our ours his her she him app apps
+one two use used using does did doing don't didn't can't won't i'm i've it's that's
+time thing things lot make made want way know now new every always never because
+""".split())
+
+# word -> weight; summed per signal to estimate how upset it reads
+_INTENSITY_LEXICON = {
+    "annoying": 1.5, "frustrating": 2.0, "frustrated": 2.0, "disappointed": 1.5,
+    "useless": 2.5, "terrible": 2.5, "horrible": 2.5, "awful": 2.5, "worst": 3.0,
+    "hate": 3.0, "garbage": 3.0, "trash": 3.0, "scam": 3.0, "ridiculous": 2.0,
+    "unusable": 2.5, "broken": 1.5, "crash": 1.0, "crashes": 1.0, "crashing": 1.5,
+    "refund": 2.0, "uninstall": 2.0, "uninstalled": 2.0, "cancel": 1.5, "angry": 2.5,
+    "pathetic": 3.0, "waste": 2.0, "stuck": 1.0, "lost": 1.5, "slow": 0.5, "bug": 0.5,
+    "bugs": 0.5, "never": 0.5, "again": 0.5,
+}
+
+_SEGMENTS = {
+    "reddit":    "Reddit community",
+    "playstore": "Android users",
+    "appstore":  "iOS users",
+}
+
+
+def _shouted(text: str) -> int:
+    # Every ALL-CAPS word of 4+ characters contains such a run; most texts don't
+    if not _CAPS_RUN_RE.search(text):
+        return 0
+    return sum(1 for w in text.split() if len(w) > 3 and w.isupper())
+
+
+def _vectorise(texts: list):
+    """
+    Return (L2-normalised TF-IDF matrix, vocabulary list, intensity per text).
+
+    Each text is scanned by one regex pass; everything after that works on
+    integer word ids in numpy. Bigrams (adjacent non-stopwords) are keyed as
+    first * words + second, so no bigram strings are built except for the
+    terms that make the vocabulary.
+    """
+    n = len(texts)
+    per_text = [_WORD_RE.findall(t.lower()) for t in texts]
+    lengths = np.fromiter(map(len, per_text), dtype=np.int64, count=n)
+    all_words = [w for words in per_text for w in words]
+    words = list(dict.fromkeys(all_words))          # unique, first-seen order
+    position = {w: i for i, w in enumerate(words)}
+    ids = np.fromiter(map(position.__getitem__, all_words), dtype=np.int64, count=len(all_words))
+    doc = np.repeat(np.arange(n), lengths)
+
+    lexicon = np.array([_INTENSITY_LEXICON.get(w, 0.0) for w in words], dtype=np.float64)
+    intensity = np.bincount(doc, weights=lexicon[ids], minlength=n).astype(np.float64)
+    intensity += np.array([min(t.count("!"), 5) * 0.3 + _shouted(t) * 0.5 for t in texts])
+
+    stop = np.array([w in _STOPWORDS for w in words], dtype=bool).reshape(-1)
+    kept = ~stop[ids]
+    uni, uni_doc = ids[kept], doc[kept]
+    pair = uni_doc[:-1] == uni_doc[1:]
+    size = len(words)
+    keys = np.concatenate([uni, size + uni[:-1][pair] * size + uni[1:][pair]])
+    key_doc = np.concatenate([uni_doc, uni_doc[:-1][pair]])
+
+    if not len(keys):
+        return np.zeros((n, 0), dtype=np.float32), [], intensity
+
+    # One sort over (text, term) cells gives tf; df counts the distinct cells
+    span = size + size * size
+    cells, tf = np.unique(key_doc * span + keys, return_counts=True)
+    cell_doc, cell_key = np.divmod(cells, span)
+    terms, cell_term = np.unique(cell_key, return_inverse=True)
+    df = np.bincount(cell_term, minlength=len(terms))
+
+    def term_text(key: int) -> str:
+        if key < size:
+            return words[key]
+        first, second = divmod(key - size, size)
+        return f"{words[first]} {words[second]}"
+
+    max_df = max(_MIN_DF, int(n * _MAX_DF_RATIO)) if n >= 10 else n
+    candidates = np.flatnonzero((df >= _MIN_DF) & (df <= max_df))
+    if not len(candidates):
+        candidates = np.arange(len(terms))
+    if len(candidates) > _MAX_FEATURES:
+        # Only terms tied with or above the cut-off can make the vocabulary
+        cutoff = np.partition(df[candidates], -_MAX_FEATURES)[-_MAX_FEATURES]
+        candidates = candidates[df[candidates] >= cutoff]
+    ranked = sorted(((-int(df[t]), term_text(int(terms[t])), t) for t in candidates))[:_MAX_FEATURES]
+    vocab = [text for _, text, _ in ranked]
+    chosen = np.array([t for _, _, t in ranked], dtype=np.int64)
+
+    column = np.full(len(terms), -1)
+    column[chosen] = np.arange(len(chosen))
+    in_vocab = column[cell_term] >= 0
+    rows, cols = cell_doc[in_vocab], column[cell_term[in_vocab]]
+    idf = np.log((1.0 + n) / (1.0 + df[chosen].astype(np.float32))) + 1.0
+
+    matrix = np.zeros((n, len(vocab)), dtype=np.float32)
+    matrix[rows, cols] = (1.0 + np.log(tf[in_vocab])).astype(np.float32) * idf[cols]
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    np.divide(matrix, norms, out=matrix, where=norms > 0)
+    return matrix, vocab, intensity
+
+
+def _kmeans(matrix: np.ndarray, k: int):
+    """Spherical k-means; returns (labels, unit centroids)."""
+    rng = np.random.default_rng(_SEED)
+    n = matrix.shape[0]
+
+    # k-means++ seeding on cosine distance
+    centroids = [matrix[rng.integers(n)]]
+    closest = 1.0 - matrix @ centroids[0]
+    for _ in range(1, k):
+        weights = np.clip(closest, 0, None) ** 2
+        total = weights.sum()
+        pick = rng.choice(n, p=weights / total) if total > 0 else rng.integers(n)
+        centroids.append(matrix[pick])
+        closest = np.minimum(closest, 1.0 - matrix @ matrix[pick])
+    centroids = np.array(centroids)
+
+    labels = np.full(n, -1)
+    for _ in range(_ITERATIONS):
+        similarity = matrix @ centroids.T
+        new_labels = similarity.argmax(axis=1)
+        if np.array_equal(new_labels, labels):
+            break
+        labels = new_labels
+        # Sum members per cluster with one matmul instead of k boolean copies
+        assignment = np.zeros((k, n), dtype=matrix.dtype)
+        assignment[labels, np.arange(n)] = 1.0
+        sums = assignment @ matrix
+        for c in range(k):
+            if not assignment[c].any():
+                # Re-seed an empty cluster on the worst-fitting signal
+                worst = similarity.max(axis=1).argmin()
+                centroids[c] = matrix[worst]
+                continue
+            norm = np.linalg.norm(sums[c])
+            centroids[c] = sums[c] / norm if norm > 0 else sums[c]
+    return labels, centroids
+
+
+def _label(centroid: np.ndarray, vocab: list, taken: set) -> str:
+    terms = []
+    for j in np.argsort(-centroid):
+        if centroid[j] <= 0 or len(terms) == _LABEL_TERMS:
+            break
+        term = vocab[j]
+        # Skip a unigram already covered by a chosen bigram, and vice versa
+        if any(term in t.split() or t in term.split() for t in terms):
+            continue
+        terms.append(term)
+    name = " / ".join(t.title() for t in terms) or "General Experience"
+    while name in taken:
+        name += " (cont.)"
+    return name
+
+
+def _choose_k(n: int) -> int:
+    if n < 4:
+        return 1
+    return max(2, min(_MAX_K, round(math.sqrt(n / 2))))
+
+
+def cluster_indices(signals: list, k: int = None) -> list:
+    """
+    Cluster signals into themes of the form
+    {"name", "indices", "emotional_intensity", "primary_segment"}, with
+    indices into `signals` ordered by closeness to the theme centroid.
+    """
+    if not signals:
+        return []
+
+    texts = [f"{s.get('title', '')} {s.get('text', '')}" for s in signals]
+    matrix, vocab, intensity = _vectorise(texts)
+
+    has_terms = matrix.any(axis=1) if vocab else np.zeros(len(signals), dtype=bool)
+    clustered = np.flatnonzero(has_terms)
+    groups = []
+    if len(clustered):
+        k = min(k or _choose_k(len(clustered)), len(clustered))
+        labels, centroids = _kmeans(matrix[clustered], k)
+        for c in range(k):
+            members = clustered[labels == c]
+            if len(members) == 0:
+                continue
+            closeness = matrix[members] @ centroids[c]
+            groups.append((centroids[c], members[np.argsort(-closeness, kind="stable")]))
+
+    themes, taken = [], set()
+    for centroid, members in sorted(groups, key=lambda g: -len(g[1])):
+        name = _label(centroid, vocab, taken)
+        taken.add(name)
+        themes.append(_theme(name, members, signals, intensity))
+
+    leftovers = np.flatnonzero(~has_terms)
+    if len(leftovers):
+        themes.append(_theme("General Experience", leftovers, signals, intensity))
+    return themes
+
+
+def _theme(name: str, members, signals: list, intensity) -> dict:
+    sources = Counter(signals[i].get("source", "") for i in members)
+    source = sources.most_common(1)[0][0]
+    return {
+        "name": name,
+        "indices": [int(i) for i in members],
+        "emotional_intensity": int(np.clip(round(4 + 1.5 * intensity[members].mean()), 1, 10)),
+        "primary_segment": _SEGMENTS.get(source, "General"),
+    }
+
+
+def cluster_signals(signals: list, k: int = None) -> list:
+    """Themes in cluster_themes' shape: name, frequency, intensity, segment, quotes."""
+    themes = []
+    for t in cluster_indices(signals, k):
+        quotes = [signals[i] for i in t["indices"]]
+        themes.append({
+            "name": t["name"],
+            "frequency": sum(q.get("duplicate_count", 1) for q in quotes),
+            "emotional_intensity": t["emotional_intensity"],
+            "primary_segment": t["primary_segment"],
+            "quotes": quotes[:5],
+        })
+    return sorted(themes, key=lambda x: x["frequency"], reverse=True)
+
+
+def _unit(vector: np.ndarray) -> np.ndarray:
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm > 0 else vector
+
+
+def merge_themes(signals: list, themes: list, max_themes: int = _MAX_K) -> list:
+    """
+    Merge partial themes (cluster_indices shape, indices into `signals`) that
+    describe the same problem, e.g. per-chunk themes named differently by
+    separate model calls. Each theme is the centroid of its members' TF-IDF
+    vectors, nudged towards its name. The most similar pair is merged while
+    any pair reaches _MERGE_SIMILARITY; past that, the smallest theme is
+    folded into its nearest until at most max_themes remain. A merged theme
+    keeps the larger side's name and segment; intensity is averaged by size.
+    """
+    groups = [{**t, "indices": list(t["indices"])} for t in themes]
+    if len(groups) <= 1:
+        return groups
+
+    texts = [f"{s.get('title', '')} {s.get('text', '')}" for s in signals]
+    matrix, _, _ = _vectorise(texts + [g["name"] for g in groups])
+    signal_vectors, name_vectors = matrix[:len(signals)], matrix[len(signals):]
+
+    def centroid(j: int) -> np.ndarray:
+        members = _unit(signal_vectors[groups[j]["indices"]].sum(axis=0))
+        return _unit(members + _NAME_WEIGHT * name_vectors[j])
+
+    centroids = np.array([centroid(j) for j in range(len(groups))])
+    similarity = centroids @ centroids.T
+    np.fill_diagonal(similarity, -np.inf)
+    dead = np.zeros(len(groups), dtype=bool)
+    alive = len(groups)
+    while alive > 1:
+        a, b = np.unravel_index(similarity.argmax(), similarity.shape)
+        if similarity[a, b] < _MERGE_SIMILARITY:
+            if alive <= max_themes:
+                break
+            # Over the cap: fold the smallest theme into its nearest
+            a = min((j for j, g in enumerate(groups) if g is not None),
+                    key=lambda j: len(groups[j]["indices"]))
+            b = similarity[a].argmax()
+        keep, drop = (a, b) if len(groups[a]["indices"]) >= len(groups[b]["indices"]) else (b, a)
+        _absorb(groups[keep], groups[drop])
+        groups[drop] = None
+        dead[drop] = True
+        alive -= 1
+
+        centroids[keep] = centroid(keep)
+        row = centroids @ centroids[keep]
+        row[dead] = -np.inf
+        row[keep] = -np.inf
+        similarity[keep, :] = row
+        similarity[:, keep] = row
+        similarity[drop, :] = -np.inf
+        similarity[:, drop] = -np.inf
+
+    return [g for g in groups if g is not None]
+
+
+def _absorb(into: dict, other: dict) -> None:
+    size, extra = len(into["indices"]), len(other["indices"])
+    try:
+        into["emotional_intensity"] = round(
+            (into["emotional_intensity"] * size + other["emotional_intensity"] * extra)
+            / (size + extra), 1
+        )
+    except TypeError:
+        pass
+    seen = set(into["indices"])
+    into["indices"] += [i for i in other["indices"] if i not in seen]
@@ -0,0 +1,162 @@
+"""
+Per-run cost / latency accounting.
+
+A pipeline run opens a RunMetrics with `with metrics.run() as m:`; the
+current run and stage live in context variables, so every LLM call
+(llm_gateway) and scraper request (http_client, Play Store calls) made while
+it is active is attributed to it and to the stage that made it:
+
+  llm     calls, cache hits, input / output tokens, estimated cost, seconds
+  http    network requests, cache hits (incl. 304 revalidations), seconds
+
+Plain ThreadPoolExecutor workers do not inherit context variables, so
+pipeline code uses ContextThreadPoolExecutor, which runs each task in a copy
+of the submitting thread's context. Outside a run, record_* are no-ops.
+"""
+
+import contextvars
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Optional
+
+# USD per million (input, output) tokens, by model prefix (first match wins)
+_PRICES_PER_MTOK = {
+    "claude-3-haiku":    (0.25, 1.25),
+    "claude-3-5-haiku":  (0.80, 4.00),
+    "claude-3-5-sonnet": (3.00, 15.00),
+    "claude-3-opus":     (15.00, 75.00),
+    "local-":            (0.0, 0.0),
+}
+_DEFAULT_PRICE = (3.00, 15.00)   # unknown models: assume a mid-tier price
+
+_COUNTERS = (
+    "llm_calls", "llm_cache_hits", "input_tokens", "output_tokens", "cost_usd",
+    "llm_seconds", "http_requests", "http_cache_hits", "http_seconds",
+)
+
+_current_run: contextvars.ContextVar = contextvars.ContextVar("metrics_run", default=None)
+_current_stage: contextvars.ContextVar = contextvars.ContextVar("metrics_stage", default="other")
+
+
+def _price(model: str) -> tuple:
+    for prefix, price in _PRICES_PER_MTOK.items():
+        if model.startswith(prefix):
+            return price
+    return _DEFAULT_PRICE
+
+
+class RunMetrics:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.counts: dict = {}            # free-form run-level numbers (e.g. signals)
+        self._stages: dict = {}
+        self._lock = threading.Lock()
+
+    def _add(self, **amounts) -> None:
+        stage = _current_stage.get()
+        with self._lock:
+            bucket = self._stages.setdefault(stage, dict.fromkeys(_COUNTERS, 0))
+            for key, value in amounts.items():
+                bucket[key] += value
+
+    def snapshot(self, stage_seconds: Optional[dict] = None) -> dict:
+        """Totals plus per-stage breakdown; stage_seconds adds wall time per stage."""
+        with self._lock:
+            stages = {name: dict(bucket) for name, bucket in self._stages.items()}
+        for name, seconds in (stage_seconds or {}).items():
+            stages.setdefault(name, dict.fromkeys(_COUNTERS, 0))["seconds"] = seconds
+
+        totals = dict.fromkeys(_COUNTERS, 0)
+        for bucket in stages.values():
+            for key in _COUNTERS:
+                totals[key] += bucket[key]
+        for bucket in [totals, *stages.values()]:
+            bucket["cost_usd"] = round(bucket["cost_usd"], 6)
+            bucket["llm_seconds"] = round(bucket["llm_seconds"], 3)
+            bucket["http_seconds"] = round(bucket["http_seconds"], 3)
+
+        return {
+            "total_seconds": round(time.perf_counter() - self.started, 3),
+            "totals": totals,
+            "stages": stages,
+            **self.counts,
+        }
+
+
+@contextmanager
+def run():
+    """Collect metrics for everything done in this context until exit."""
+    metrics = RunMetrics()
+    token = _current_run.set(metrics)
+    try:
+        yield metrics
+    finally:
+        _current_run.reset(token)
+
+
+@contextmanager
+def stage(name: str):
+    """Attribute metrics recorded in this context to pipeline stage `name`."""
+    token = _current_stage.set(name)
+    try:
+        yield
+    finally:
+        _current_stage.reset(token)
+
+
+def current() -> Optional[RunMetrics]:
+    return _current_run.get()
+
+
+def count(key: str, value) -> None:
+    """Set a run-level figure (e.g. signals collected)."""
+    metrics = _current_run.get()
+    if metrics is not None:
+        metrics.counts[key] = value
+
+
+def add(key: str, value) -> None:
+    """Add to a run-level figure; safe from several threads."""
+    metrics = _current_run.get()
+    if metrics is not None:
+        with metrics._lock:
+            metrics.counts[key] = metrics.counts.get(key, 0) + value
+
+
+def record_llm(model: str, usage=None, seconds: float = 0.0, cached: bool = False) -> None:
+    metrics = _current_run.get()
+    if metrics is None:
+        return
+    if cached:
+        metrics._add(llm_cache_hits=1)
+        return
+    input_tokens = getattr(usage, "input_tokens", 0) or 0
+    output_tokens = getattr(usage, "output_tokens", 0) or 0
+    price_in, price_out = _price(model)
+    metrics._add(
+        llm_calls=1,
+        input_tokens=input_tokens,
+        output_tokens=output_tokens,
+        cost_usd=(input_tokens * price_in + output_tokens * price_out) / 1_000_000,
+        llm_seconds=seconds,
+    )
+
+
+def record_http(seconds: float = 0.0, cached: bool = False) -> None:
+    metrics = _current_run.get()
+    if metrics is None:
+        return
+    if cached:
+        metrics._add(http_cache_hits=1, http_seconds=seconds)
+    else:
+        metrics._add(http_requests=1, http_seconds=seconds)
+
+
+class ContextThreadPoolExecutor(ThreadPoolExecutor):
+    """ThreadPoolExecutor whose tasks see the submitter's context variables."""
+
+    def submit(self, fn, /, *args, **kwargs):
+        context = contextvars.copy_context()
+        return super().submit(context.run, fn, *args, **kwargs)
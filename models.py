@@ -26,10 +26,36 @@ class Product(Base):
     appstore_id = Column(String, nullable=True)
     appstore_rating = Column(Float, nullable=True)
 
+    # Product profile (validation, category, enrichment), refreshed on a TTL.
+    # profile_category is the analysis category; category above is the store genre.
+    is_valid = Column(Boolean, nullable=True)
+    profile_category = Column(String, nullable=True)
+    enrichment_context = Column(Text, nullable=True)
+    profile_refreshed_at = Column(DateTime, nullable=True)
+
+    # Set once discover_product has searched both stores, listing or not
+    discovered_at = Column(DateTime, nullable=True)
+
     created_at = Column(DateTime(timezone=True), default=datetime.utcnow)
     active = Column(Boolean, default=True)
 
 
+# ==========================================================
+# APP ID LOOKUP MISSES
+# Negative cache for store searches that found nothing, so an
+# unknown product does not re-run a live search on every run.
+# ==========================================================
+class AppIdMiss(Base):
+    __tablename__ = "app_id_misses"
+
+    id = Column(Integer, primary_key=True, index=True)
+
+    normalized_name = Column(String, index=True)
+    store = Column(String)  # "playstore" | "appstore"
+
+    checked_at = Column(DateTime(timezone=True), default=datetime.utcnow)
+
+
 # ==========================================================
 # RAW SIGNALS
 # ==========================================================
@@ -44,9 +70,37 @@ class Signal(Base):
     url = Column(String)
     sentiment = Column(String)
 
+    # Full scraper contract, so a stored window can be served back as signals
+    term = Column(String, index=True, nullable=True)
+    title = Column(String, nullable=True)
+    score = Column(Float, nullable=True)
+    date = Column(String, nullable=True)  # YYYY-MM-DD
+
+    # Hash of URL + text; sentiment is reused while this is unchanged
+    content_key = Column(String, index=True, nullable=True)
+
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
 
+# ==========================================================
+# PER-SOURCE HIGH-WATER MARKS
+# Newest item seen per (source, term); later runs only fetch
+# items newer than this and merge with the stored window.
+# ==========================================================
+class SourceWatermark(Base):
+    __tablename__ = "source_watermarks"
+
+    id = Column(Integer, primary_key=True, index=True)
+
+    source = Column(String, index=True)
+    term = Column(String, index=True)
+
+    last_date = Column(String)   # YYYY-MM-DD of newest signal seen
+    last_url = Column(String)    # its URL (the source's stable ID)
+
+    updated_at = Column(DateTime(timezone=True), default=datetime.utcnow)
+
+
 # ==========================================================
 # WEEKLY SNAPSHOT
 # ==========================================================
@@ -78,4 +132,48 @@ class ThemeSnapshot(Base):
 
     theme_name = Column(String)
     frequency = Column(Integer)
-    intensity = Column(Float)
\ No newline at end of file
+    intensity = Column(Float)
+
+
+# ==========================================================
+# INSIGHT MEMO
+# extract_insights output keyed by a fingerprint of its input
+# (top themes, bucketed, plus category); reused while the
+# theme set is unchanged.
+# ==========================================================
+class InsightMemo(Base):
+    __tablename__ = "insight_memos"
+
+    id = Column(Integer, primary_key=True, index=True)
+
+    fingerprint = Column(String, unique=True, index=True)
+    product = Column(String, index=True)  # product that last produced it
+    category = Column(String)
+    insights = Column(Text)  # JSON
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    refreshed_at = Column(DateTime, nullable=True)  # last (re)write; served for database._INSIGHT_TTL
+
+
+# ==========================================================
+# PIPELINE RUN METRICS
+# One row per analysis run: headline totals as columns, the
+# full per-stage breakdown (metrics.RunMetrics.snapshot) as JSON.
+# ==========================================================
+class PipelineRun(Base):
+    __tablename__ = "pipeline_runs"
+
+    id = Column(Integer, primary_key=True, index=True)
+
+    product = Column(String, index=True)
+
+    total_seconds = Column(Float)
+    signals = Column(Integer, nullable=True)
+    llm_calls = Column(Integer)
+    input_tokens = Column(Integer)
+    output_tokens = Column(Integer)
+    cost_usd = Column(Float)
+    http_requests = Column(Integer)
+    detail = Column(Text)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -0,0 +1,121 @@
+"""
+Minimal stage-DAG executor for the analysis pipeline.
+
+Each Stage names the stages whose results it needs; those results are passed
+to its function as keyword arguments. Stages run on a thread pool as soon as
+their inputs are ready, so independent work overlaps (e.g. product profile
+alongside signal collection, summary alongside clustering). Wall-clock time
+per stage is recorded and printed, and metrics recorded inside a stage are
+attributed to it.
+
+A stage ends the run early by raising StopPipeline(result); pending stages
+are cancelled and run_dag returns that result. Any other exception
+propagates to the caller, like it would in a plain sequence of calls.
+
+Stages already running are not interrupted, but once the run is over
+cancelled() is true for them and for the work they spawned (through
+ContextThreadPoolExecutor), so they can stop early and skip persisting
+results for a run that was rejected.
+"""
+
+import contextvars
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, wait
+from typing import Any, Callable, Iterable, Optional
+
+import metrics
+from metrics import ContextThreadPoolExecutor
+
+
+_cancel: contextvars.ContextVar = contextvars.ContextVar("pipeline_cancel", default=None)
+
+
+def cancelled() -> bool:
+    """True inside a stage (or work it spawned) once its run has stopped, failed or finished."""
+    event = _cancel.get()
+    return event is not None and event.is_set()
+
+
+class StopPipeline(Exception):
+    """Raised by a stage to finish the run with `result` instead."""
+
+    def __init__(self, result: Any):
+        super().__init__("pipeline stopped early")
+        self.result = result
+
+
+class Stage:
+    def __init__(self, name: str, fn: Callable[..., Any], deps: Iterable[str] = ()):
+        self.name = name
+        self.fn = fn
+        self.deps = tuple(deps)
+        self.elapsed = 0.0
+
+
+class DagResult:
+    def __init__(self, values: dict, timings: dict, stopped: Optional[Any] = None):
+        self.values = values
+        self.timings = timings          # stage -> seconds
+        self.stopped = stopped          # StopPipeline result, if a stage stopped the run
+
+
+def _timed(stage: Stage, kwargs: dict):
+    start = time.perf_counter()
+    try:
+        with metrics.stage(stage.name):
+            return stage.fn(**kwargs)
+    finally:
+        stage.elapsed = time.perf_counter() - start
+
+
+def run_dag(stages: list, inputs: Optional[dict] = None, workers: int = 4,
+            label: str = "Pipeline") -> DagResult:
+    """
+    Run `stages` respecting their deps. `inputs` are pre-resolved values that
+    stages may depend on by name.
+    """
+    values = dict(inputs or {})
+    by_name = {s.name: s for s in stages}
+    for s in stages:
+        missing = [d for d in s.deps if d not in by_name and d not in values]
+        if missing:
+            raise ValueError(f"Stage '{s.name}' depends on unknown {missing}")
+
+    timings = {}
+    pending = {s.name for s in stages}
+    running = {}
+    cancel = threading.Event()
+    token = _cancel.set(cancel)     # copied into every stage's context on submit
+    pool = ContextThreadPoolExecutor(max_workers=workers)
+    try:
+        while pending or running:
+            for name in sorted(pending):
+                stage = by_name[name]
+                if all(d in values for d in stage.deps):
+                    kwargs = {d: values[d] for d in stage.deps}
+                    running[pool.submit(_timed, stage, kwargs)] = stage
+                    pending.discard(name)
+
+            if not running:
+                raise ValueError(f"Dependency cycle among stages {sorted(pending)}")
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage = running.pop(future)
+                try:
+                    values[stage.name] = future.result()
+                except StopPipeline as stop:
+                    timings[stage.name] = round(stage.elapsed, 3)
+                    print(f"[{label}] Stage {stage.name} stopped the run "
+                          f"after {stage.elapsed:.2f}s", flush=True)
+                    return DagResult(values, timings, stopped=stop.result)
+                timings[stage.name] = round(stage.elapsed, 3)
+                print(f"[{label}] Stage {stage.name}: {stage.elapsed:.2f}s", flush=True)
+        return DagResult(values, timings)
+    finally:
+        # Early stop / failure: don't start anything else or wait for stragglers,
+        # and tell any still running that their results are no longer wanted
+        cancel.set()
+        pool.shutdown(wait=False, cancel_futures=True)
+        _cancel.reset(token)
@@ -0,0 +1,130 @@
+"""
+Process-wide per-host token-bucket rate limiter.
+
+Replaces the fixed time.sleep() pauses the scrapers used to take between
+pages and terms. Every request (from any scraper, any worker thread, any
+concurrent /analyze call) takes a token from its host's bucket first, so
+we run as fast as each host allows and no faster.
+
+Hosts can tighten the budget at runtime: a Retry-After header blocks the
+host until that time, and Reddit-style x-ratelimit-remaining /
+x-ratelimit-reset headers re-pace the bucket to spread what is left of
+the window evenly.
+"""
+
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Optional
+
+# (host suffix, tokens per second, burst). First suffix match wins.
+_HOST_RATES = [
+    ("reddit.com",        1.0, 2),
+    ("itunes.apple.com",  3.0, 4),
+    ("play.google.com",   2.0, 2),
+]
+_DEFAULT_RATE  = (5.0, 5)
+_MIN_RATE      = 0.05   # never pace slower than one request per 20s
+_MAX_BLOCK     = 60.0   # cap on any server-requested pause, in seconds
+
+
+class _Bucket:
+    def __init__(self, rate: float, burst: int):
+        self.max_rate = rate
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self) -> float:
+        """Take one token; return how long the caller must wait before using it."""
+        with self.lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.tokens -= 1
+            wait = 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+            return max(wait, self.blocked_until - now)
+
+    def block(self, seconds: float) -> None:
+        with self.lock:
+            until = time.monotonic() + min(seconds, _MAX_BLOCK)
+            self.blocked_until = max(self.blocked_until, until)
+
+    def repace(self, remaining: float, reset: float) -> None:
+        """Spread the remaining quota over the time left in the server's window."""
+        with self.lock:
+            if remaining < 1:
+                self.blocked_until = max(self.blocked_until,
+                                         time.monotonic() + min(reset, _MAX_BLOCK))
+                return
+            self._refill(time.monotonic())
+            self.rate = max(_MIN_RATE, min(self.max_rate, remaining / max(reset, 1.0)))
+
+
+_buckets: dict = {}
+_buckets_lock = threading.Lock()
+
+
+def _normalise(host: str) -> str:
+    return host.lower().split(":")[0]
+
+
+def _bucket_for(host: str) -> _Bucket:
+    host = _normalise(host)
+    with _buckets_lock:
+        bucket = _buckets.get(host)
+        if bucket is None:
+            rate, burst = _DEFAULT_RATE
+            for suffix, r, b in _HOST_RATES:
+                if host == suffix or host.endswith("." + suffix):
+                    rate, burst = r, b
+                    break
+            bucket = _Bucket(rate, burst)
+            _buckets[host] = bucket
+        return bucket
+
+
+def acquire(host: str) -> None:
+    """Block the calling thread until the host's bucket allows one request."""
+    wait = _bucket_for(host).reserve()
+    if wait > 0:
+        time.sleep(wait)
+
+
+def _parse_retry_after(value: str) -> Optional[float]:
+    value = value.strip()
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def observe(host: str, status_code: int, headers) -> None:
+    """Feed a response's status and rate-limit headers back into the host's bucket."""
+    bucket = _bucket_for(host)
+
+    retry_after = _parse_retry_after(headers.get("Retry-After", ""))
+    if retry_after is not None and status_code in (429, 503):
+        bucket.block(retry_after)
+    elif status_code == 429:
+        bucket.block(1.0 / bucket.rate)
+
+    remaining = headers.get("x-ratelimit-remaining")
+    reset = headers.get("x-ratelimit-reset")
+    if remaining is not None and reset is not None:
+        try:
+            bucket.repace(float(remaining), float(reset))
+        except ValueError:
+            pass
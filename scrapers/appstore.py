@@ -2,23 +2,39 @@
 App Store signal scraper.
 
 Uses the public iTunes RSS customer-reviews feed (no external library required —
-only `requests`, already in requirements.txt).
+requests go through the shared pooled client in http_client.py).
 
 Feed URL pattern:
-  https://itunes.apple.com/us/rss/customerreviews/page={n}/id={app_id}/sortBy=mostRecent/json
+  https://itunes.apple.com/{country}/rss/customerreviews/page={n}/id={app_id}/sortBy=mostRecent/json
 
 Each page returns up to 50 reviews; pages 1-10 are available (500 reviews max).
+Page URLs are known up front, so pages are fetched in parallel (the per-host
+rate limiter still paces them) across several English-language storefronts.
+A storefront stops being paged as soon as one of its pages falls entirely
+before the cutoff, and the whole app stops once _MAX_PER_APP is reached.
 """
 
-import requests
-import time
+import os
+from concurrent.futures import FIRST_COMPLETED, wait
 from datetime import datetime, timedelta, timezone
-from config import KNOWN_APPS
+from typing import Optional
+from discovery import resolve_app_id
+import http_client
+from metrics import ContextThreadPoolExecutor
 
-_RSS_URL    = "https://itunes.apple.com/us/rss/customerreviews/page={page}/id={app_id}/sortBy=mostRecent/json"
+_RSS_URL    = "https://itunes.apple.com/{country}/rss/customerreviews/page={page}/id={app_id}/sortBy=mostRecent/json"
 _HEADERS    = {"User-Agent": "discovery-engine/1.0 (signal-collector)"}
-_MAX_PER_APP = 150   # cap per product
-_MAX_PAGES   = 5     # 5 × 50 = 250 candidates before filter
+_MAX_PER_APP = 150   # cap per product (across all storefronts)
+_MAX_PAGES   = 5     # per storefront: 5 × 50 = 250 candidates before filter
+_COUNTRIES   = tuple(
+    c.strip().lower()
+    for c in os.getenv("APPSTORE_COUNTRIES", "us,gb,ca,au").split(",")
+    if c.strip()
+)
+_PAGE_WINDOW  = 2    # pages in flight per storefront
+_PAGE_WORKERS = 6    # pages in flight per app
+
+WINDOW_DAYS = 90     # same window as the Play Store
 
 
 def _parse_date(label: str) -> datetime:
@@ -35,103 +51,189 @@ def _parse_date(label: str) -> datetime:
     return dt
 
 
-def fetch_reviews(product_name: str, competitors: list) -> list:
-    terms  = [product_name] + competitors
-    cutoff = datetime.now(timezone.utc) - timedelta(days=90)
-    results  = []
-    seen_urls = set()
+def _fetch_page(term: str, app_id: str, country: str, page: int) -> Optional[list]:
+    """
+    Fetch one RSS page and return its review entries.
+    Returns None when the storefront has nothing more to give (404, error, empty).
+    """
+    url = _RSS_URL.format(country=country, page=page, app_id=app_id)
+    label = f"'{term}' {country} page {page}"
 
-    for term in terms:
-        term = term.lower()
+    try:
+        resp = http_client.get(url, headers=_HEADERS)
+    except Exception as e:
+        print(f"[AppStore] Network error for {label}: {e}")
+        return None
 
-        if term not in KNOWN_APPS or not KNOWN_APPS[term].get("appstore"):
-            print(f"[AppStore] No ID for '{term}', skipping.")
+    if resp.status_code == 404:
+        return None
+    if resp.status_code != 200:
+        print(f"[AppStore] HTTP {resp.status_code} for {label}")
+        return None
+
+    try:
+        data = resp.json()
+    except Exception as e:
+        print(f"[AppStore] JSON parse error for {label}: {e}")
+        return None
+
+    entries = data.get("feed", {}).get("entry", [])
+
+    # iTunes returns a dict (not list) when there is exactly one entry
+    if isinstance(entries, dict):
+        entries = [entries]
+
+    # Entries without im:rating are app metadata rows — skip them
+    entries = [e for e in entries if e.get("im:rating")]
+    if not entries:
+        print(f"[AppStore] No entries on {label}")
+        return None
+    return entries
+
+
+def _parse_entries(entries: list, term: str, app_id: str, cutoff: datetime,
+                   seen_urls: set) -> tuple:
+    """
+    Convert raw RSS entries into signal dicts.
+    Returns (signals, all_before_cutoff).
+    """
+    out = []
+    all_old = True
+
+    for entry in entries:
+        date_str    = entry.get("updated", {}).get("label", "")
+        review_date = _parse_date(date_str)
+
+        if review_date < cutoff:
             continue
+        all_old = False
 
-        app_id = KNOWN_APPS[term]["appstore"]
-        print(f"[AppStore] Fetching reviews for '{term}' (id={app_id})")
-        collected = 0
-
-        for page in range(1, _MAX_PAGES + 1):
-            url = _RSS_URL.format(page=page, app_id=app_id)
-
-            try:
-                resp = requests.get(url, headers=_HEADERS, timeout=10)
-            except Exception as e:
-                print(f"[AppStore] Network error for '{term}' page {page}: {e}")
-                break
-
-            if resp.status_code == 404:
-                break
-            if resp.status_code != 200:
-                print(f"[AppStore] HTTP {resp.status_code} for '{term}' page {page}")
-                break
-
-            try:
-                data = resp.json()
-            except Exception as e:
-                print(f"[AppStore] JSON parse error for '{term}' page {page}: {e}")
-                break
-
-            entries = data.get("feed", {}).get("entry", [])
-
-            # iTunes returns a dict (not list) when there is exactly one entry
-            if isinstance(entries, dict):
-                entries = [entries]
-
-            if not entries:
-                print(f"[AppStore] No entries on page {page} for '{term}'")
-                break
-
-            page_added = 0
-            for entry in entries:
-                # Entries without im:rating are app metadata rows — skip them
-                if not entry.get("im:rating"):
-                    continue
+        review_id     = entry.get("id", {}).get("label", "")
+        synthetic_url = f"https://apps.apple.com/app/id{app_id}#r{review_id}"
 
-                review_id     = entry.get("id", {}).get("label", "")
-                synthetic_url = f"https://apps.apple.com/app/id{app_id}#r{review_id}"
+        if synthetic_url in seen_urls:
+            continue
+        seen_urls.add(synthetic_url)
 
-                if synthetic_url in seen_urls:
-                    continue
-                seen_urls.add(synthetic_url)
+        text = entry.get("content", {}).get("label", "").strip()
+        if len(text) < 20:
+            continue
 
-                text = entry.get("content", {}).get("label", "").strip()
-                if len(text) < 20:
+        rating_str = entry.get("im:rating", {}).get("label", "0")
+        title_str  = entry.get("title",     {}).get("label", "")
+
+        out.append({
+            "source": "appstore",
+            "term":   term,
+            "text":   text[:2000],
+            "title":  title_str,
+            "score":  float(rating_str) if rating_str.isdigit() else 0.0,
+            "url":    synthetic_url,
+            "date":   review_date.strftime("%Y-%m-%d"),
+        })
+
+    return out, all_old
+
+
+def _iter_app_pages(term: str, app_id: str, cutoff: datetime, seen_urls: set):
+    """
+    Page every storefront for one app in parallel, with early termination.
+    Yields ((page, country index), signals) in completion order.
+    """
+    next_page = {country: 1 for country in _COUNTRIES}
+    stopped   = set()
+    collected = 0
+
+    with ContextThreadPoolExecutor(max_workers=_PAGE_WORKERS) as pool:
+        in_flight = {}
+
+        def _top_up():
+            for country in _COUNTRIES:
+                while (country not in stopped
+                       and next_page[country] <= _MAX_PAGES
+                       and sum(1 for c, _ in in_flight.values() if c == country) < _PAGE_WINDOW):
+                    page = next_page[country]
+                    next_page[country] += 1
+                    future = pool.submit(_fetch_page, term, app_id, country, page)
+                    in_flight[future] = (country, page)
+
+        _top_up()
+        while in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                country, page = in_flight.pop(future)
+                entries = future.result()
+                if entries is None:
+                    stopped.add(country)
                     continue
 
-                date_str    = entry.get("updated", {}).get("label", "")
-                review_date = _parse_date(date_str)
+                signals, all_old = _parse_entries(entries, term, app_id, cutoff, seen_urls)
+                collected += len(signals)
+                print(f"[AppStore] '{term}' {country} page {page}: {len(signals)} reviews accepted")
+                yield (page, _COUNTRIES.index(country)), signals
 
-                if review_date < cutoff:
-                    continue
+                # Feed is newest-first: a page entirely before the cutoff ends this storefront
+                if all_old:
+                    stopped.add(country)
 
-                rating_str = entry.get("im:rating", {}).get("label", "0")
-                title_str  = entry.get("title",     {}).get("label", "")
+            if collected >= _MAX_PER_APP:
+                stopped.update(_COUNTRIES)
+                for future in in_flight:
+                    future.cancel()
+            _top_up()
+            in_flight = {f: v for f, v in in_flight.items() if not f.cancelled()}
 
-                results.append({
-                    "source": "appstore",
-                    "term":   term,
-                    "text":   text[:2000],
-                    "title":  title_str,
-                    "score":  float(rating_str) if rating_str.isdigit() else 0.0,
-                    "url":    synthetic_url,
-                    "date":   review_date.strftime("%Y-%m-%d"),
-                })
-                page_added += 1
-                collected  += 1
 
-                if collected >= _MAX_PER_APP:
-                    break
+def _fetch_app(term: str, app_id: str, cutoff: datetime, seen_urls: set) -> list:
+    """All pages for one app, assembled in (page, storefront) order for deterministic output."""
+    by_page = dict(_iter_app_pages(term, app_id, cutoff, seen_urls))
+    results = [s for key in sorted(by_page) for s in by_page[key]]
+    return results[:_MAX_PER_APP]
 
-            print(f"[AppStore] '{term}' page {page}: {page_added} reviews accepted")
 
-            if collected >= _MAX_PER_APP:
-                break
+def _iter_apps(product_name: str, competitors: list, since: Optional[datetime]):
+    """Yield (term, app_id, cutoff) for every term with a resolvable App Store ID."""
+    cutoff = datetime.now(timezone.utc) - timedelta(days=WINDOW_DAYS)
+    if since and since > cutoff:
+        cutoff = since
+
+    for name in [product_name] + competitors:
+        term = name.lower()
+
+        app_id = resolve_app_id(name, "appstore")
+        if not app_id:
+            print(f"[AppStore] No ID for '{term}', skipping.")
+            continue
+
+        print(f"[AppStore] Fetching reviews for '{term}' (id={app_id}, storefronts={','.join(_COUNTRIES)})")
+        yield term, app_id, cutoff
 
-            time.sleep(0.5)
 
-        print(f"[AppStore] '{term}': {collected} reviews total")
+def iter_reviews(product_name: str, competitors: list,
+                 since: Optional[datetime] = None):
+    """
+    Yield signals as each RSS page arrives (streaming mode, completion order).
+    Reviews older than `since` are dropped on incremental runs.
+    """
+    seen_urls = set()
+    for term, app_id, cutoff in _iter_apps(product_name, competitors, since):
+        emitted = 0
+        for _, signals in _iter_app_pages(term, app_id, cutoff, seen_urls):
+            for s in signals[:_MAX_PER_APP - emitted]:
+                emitted += 1
+                yield s
+        print(f"[AppStore] '{term}': {emitted} reviews total")
+
+
+def fetch_reviews(product_name: str, competitors: list,
+                  since: Optional[datetime] = None) -> list:
+    results  = []
+    seen_urls = set()
+
+    for term, app_id, cutoff in _iter_apps(product_name, competitors, since):
+        app_results = _fetch_app(term, app_id, cutoff, seen_urls)
+        results.extend(app_results)
+        print(f"[AppStore] '{term}': {len(app_results)} reviews total")
 
     print(f"[AppStore] Grand total: {len(results)} signals")
     return results
@@ -1,107 +1,161 @@
 from typing import Optional
-import time
 from datetime import datetime, timedelta, timezone
 from dotenv import load_dotenv
 
 from google_play_scraper import reviews, Sort
-from config import KNOWN_APPS
+from discovery import resolve_app_id
+import time
+import fixtures
+import metrics
+import rate_limiter
 
 load_dotenv()
 
+# google-play-scraper does its own HTTP, so take limiter tokens by hand
+_PLAY_HOST = "play.google.com"
+
+WINDOW_DAYS = 90
+
+# Newest-first pages are followed via the continuation token until a review
+# falls before the cutoff, so busy apps stop early and quiet apps still get
+# their whole window. The ceiling bounds latency for very busy apps.
+_PAGE_SIZE       = 100
+_MAX_RAW_PER_APP = 600   # raw reviews fetched per app, at most
+
+
+class _ReplayToken:
+    """Stands in for a continuation token when pages come from fixtures."""
+    def __init__(self, more: bool):
+        self.token = "replay" if more else None
 
-# ----------------------------------------------------------
-# DYNAMIC PLAY STORE ID DISCOVERY
-# KNOWN_APPS is an enrichment layer (preferred IDs).
-# If not found there, attempt discovery via search.
-# ----------------------------------------------------------
-
-def _discover_app_id(term: str) -> Optional[str]:
-    """Search Play Store to find app ID for unknown products."""
-    try:
-        from google_play_scraper import search as ps_search
-        results = ps_search(term, lang="en", country="us", n_hits=5)
-        term_lower = term.lower().replace(" ", "")
-        for r in results:
-            app_id = r.get("appId", "")
-            title = r.get("title", "").lower()
-            # Accept if term appears in app ID or title
-            if term_lower in app_id.lower() or term.lower() in title:
-                print(f"Discovered Play Store ID for '{term}': {app_id}")
-                return app_id
-    except Exception as e:
-        print(f"Dynamic Play Store discovery failed for '{term}': {e}")
-    return None
-
-
-def fetch_reviews(product_name: str, competitors: list) -> list:
+
+def _reviews_page(app_id: str, page_no: int, token):
+    """One page of newest-first reviews -> (page, continuation token). Recordable."""
+    def _live():
+        rate_limiter.acquire(_PLAY_HOST)
+        start = time.perf_counter()
+        try:
+            if token is None:
+                return reviews(
+                    app_id,
+                    lang="en",
+                    country="us",
+                    sort=Sort.NEWEST,
+                    count=_PAGE_SIZE,
+                )
+            return reviews(app_id, continuation_token=token)
+        finally:
+            metrics.record_http(time.perf_counter() - start)
+
+    return fixtures.through(
+        "playstore", ["reviews", app_id, page_no, _PAGE_SIZE],
+        _live,
+        encode=lambda r: {"page": r[0], "more": bool(r[1] and r[1].token)},
+        decode=lambda p: (p["page"], _ReplayToken(p["more"])),
+    )
+
+
+def _iter_pages(app_id: str, cutoff: datetime):
+    """
+    Yield pages of newest-first reviews, following the continuation token.
+    Stops after the first page reaching past the cutoff, when the feed runs
+    out, or at _MAX_RAW_PER_APP.
+    """
+    fetched = 0
+    token = None
+    page_no = 0
+
+    while fetched < _MAX_RAW_PER_APP:
+        page, token = _reviews_page(app_id, page_no, token)
+        page_no += 1
+
+        page = page[:_MAX_RAW_PER_APP - fetched]
+        if not page:
+            return
+        fetched += len(page)
+        yield page
+
+        oldest = page[-1].get("at")
+        if oldest and oldest.replace(tzinfo=timezone.utc) < cutoff:
+            return
+        if token is None or token.token is None:
+            return
+
+
+def _to_signal(review: dict, term: str, app_id: str, cutoff: datetime,
+               seen_urls: set) -> Optional[dict]:
+    review_id = review.get("reviewId", "")
+    url = f"https://play.google.com/store/apps/details?id={app_id}&reviewId={review_id}"
+
+    if url in seen_urls:
+        return None
+    seen_urls.add(url)
+
+    at = review.get("at")
+    if not at:
+        return None
+
+    # google-play-scraper returns timezone-naive datetimes; treat as UTC
+    if at.replace(tzinfo=timezone.utc) < cutoff:
+        return None
+
+    full_text = review.get("content", "").strip()
+    if len(full_text) < 20:
+        return None
+
+    return {
+        "source": "playstore",
+        "term": term,
+        "text": full_text[:2000],
+        "title": "",
+        "score": float(review.get("score", 0)),
+        "url": url,
+        "date": at.strftime("%Y-%m-%d"),
+    }
+
+
+def iter_reviews(product_name: str, competitors: list,
+                 since: Optional[datetime] = None):
+    """
+    Yield signals as each review page arrives (streaming mode). On
+    incremental runs `since` moves the cutoff forward, so paging stops sooner.
+    """
     terms = [product_name] + competitors
     # Bug fix: 7 days was too narrow — most apps' 200 newest reviews span
     # 30–90 days. Extending to 90 days captures meaningful signal volume.
-    cutoff = datetime.now(timezone.utc) - timedelta(days=90)
-    results = []
+    cutoff = datetime.now(timezone.utc) - timedelta(days=WINDOW_DAYS)
+    if since and since > cutoff:
+        cutoff = since
     seen_urls = set()
 
-    for term in terms:
-        term = term.lower()
+    for name in terms:
+        term = name.lower()
 
-        # KNOWN_APPS preferred; fall back to dynamic discovery
-        app_id = KNOWN_APPS.get(term, {}).get("playstore")
-        if not app_id:
-            app_id = _discover_app_id(term)
+        # KNOWN_APPS -> Product table -> miss cache -> live search
+        app_id = resolve_app_id(name, "playstore")
         if not app_id:
             print(f"[PlayStore] No ID found for '{term}', skipping.")
             continue
 
         print(f"[PlayStore] Fetching reviews for '{term}' (id={app_id})")
-        before_count = len(results)
+        raw = accepted = 0
 
         try:
-            result, _ = reviews(
-                app_id,
-                lang="en",
-                country="us",
-                sort=Sort.NEWEST,
-                count=200,
-            )
-
-            print(f"[PlayStore] API returned {len(result)} raw reviews for '{term}'")
-
-            for review in result:
-                review_id = review.get("reviewId", "")
-                url = f"https://play.google.com/store/apps/details?id={app_id}&reviewId={review_id}"
-
-                if url in seen_urls:
-                    continue
-                seen_urls.add(url)
-
-                at = review.get("at")
-                if not at:
-                    continue
-
-                # google-play-scraper returns timezone-naive datetimes; treat as UTC
-                if at.replace(tzinfo=timezone.utc) < cutoff:
-                    continue
-
-                full_text = review.get("content", "").strip()
-                if len(full_text) < 20:
-                    continue
-
-                results.append({
-                    "source": "playstore",
-                    "term": term,
-                    "text": full_text[:2000],
-                    "title": "",
-                    "score": float(review.get("score", 0)),
-                    "url": url,
-                    "date": at.strftime("%Y-%m-%d"),
-                })
-
+            for page in _iter_pages(app_id, cutoff):
+                raw += len(page)
+                for review in page:
+                    signal = _to_signal(review, term, app_id, cutoff, seen_urls)
+                    if signal:
+                        accepted += 1
+                        yield signal
         except Exception as e:
             print(f"[PlayStore] Error for '{term}': {e}")
 
-        accepted = len(results) - before_count
-        print(f"[PlayStore] '{term}': {accepted} reviews passed date filter")
-        time.sleep(1)
+        print(f"[PlayStore] '{term}': {accepted} of {raw} raw reviews passed date filter")
+
 
+def fetch_reviews(product_name: str, competitors: list,
+                  since: Optional[datetime] = None) -> list:
+    results = list(iter_reviews(product_name, competitors, since=since))
     print(f"[PlayStore] Total: {len(results)} signals collected")
     return results
@@ -1,9 +1,11 @@
-import requests
 import os
-import time
 from datetime import datetime, timedelta, timezone
+from typing import Optional
+from urllib.parse import quote
 from dotenv import load_dotenv
 
+import http_client
+
 load_dotenv()
 
 # Reddit requires: <platform>:<app_id>:<version> (by /u/<username>)
@@ -14,12 +16,13 @@ _USER_AGENT = os.getenv(
 )
 _HEADERS    = {"User-Agent": _USER_AGENT}
 _MAX_PER_TERM = 75   # cap per term to stay cost-efficient
+WINDOW_DAYS   = 30   # matches the t=month search filter
 
 
 def _get_posts(url: str) -> list:
     """Hit a Reddit JSON endpoint and return raw children list."""
     try:
-        resp = requests.get(url, headers=_HEADERS, timeout=10)
+        resp = http_client.get(url, headers=_HEADERS)
         if resp.status_code == 404:
             return []
         if resp.status_code != 200:
@@ -74,40 +77,46 @@ def _extract(posts: list, term: str, cutoff: datetime, seen: set) -> list:
     return out
 
 
-def fetch_signals(product_name: str, competitors: list) -> list:
+def iter_signals(product_name: str, competitors: list,
+                 since: Optional[datetime] = None):
+    """
+    Yield signals as each Reddit search page arrives (streaming mode).
+    Posts older than `since` (or WINDOW_DAYS, whichever is later) are skipped.
+    """
     terms  = [product_name] + competitors
-    cutoff = datetime.now(timezone.utc) - timedelta(days=30)
+    cutoff = datetime.now(timezone.utc) - timedelta(days=WINDOW_DAYS)
+    if since and since > cutoff:
+        cutoff = since
     seen   = set()
-    results = []
 
     for term in terms:
         term_slug = term.lower().replace(" ", "")
-        collected = []
-
-        # ── Pass 1: product's own subreddit ──────────────────────────────
-        sub_url = (
-            f"https://www.reddit.com/r/{term_slug}/search.json?"
-            f"q={requests.utils.quote(term)}"
-            "&restrict_sr=1&sort=new&t=month&limit=50"
+        passes = (
+            # ── Pass 1: product's own subreddit ──────────────────────────
+            ("own-subreddit", (
+                f"https://www.reddit.com/r/{term_slug}/search.json?"
+                f"q={quote(term)}"
+                "&restrict_sr=1&sort=new&t=month&limit=50"
+            )),
+            # ── Pass 2: broad Reddit search ───────────────────────────────
+            ("broad search", (
+                "https://www.reddit.com/search.json?"
+                f"q={quote(term)}"
+                "&sort=new&t=month&limit=100"
+            )),
         )
-        sub_posts = _get_posts(sub_url)
-        sub_signals = _extract(sub_posts, term, cutoff, seen)
-        collected.extend(sub_signals)
-        print(f"[Reddit] '{term}' own-subreddit: {len(sub_signals)} signals")
-
-        # ── Pass 2: broad Reddit search ───────────────────────────────────
-        broad_url = (
-            "https://www.reddit.com/search.json?"
-            f"q={requests.utils.quote(term)}"
-            "&sort=new&t=month&limit=100"
-        )
-        broad_posts   = _get_posts(broad_url)
-        broad_signals = _extract(broad_posts, term, cutoff, seen)
-        collected.extend(broad_signals)
-        print(f"[Reddit] '{term}' broad search: {len(broad_signals)} signals")
 
-        results.extend(collected[:_MAX_PER_TERM])
-        time.sleep(1)
+        emitted = 0
+        for label, url in passes:
+            signals = _extract(_get_posts(url), term, cutoff, seen)
+            print(f"[Reddit] '{term}' {label}: {len(signals)} signals")
+            for s in signals[:_MAX_PER_TERM - emitted]:
+                emitted += 1
+                yield s
+
 
+def fetch_signals(product_name: str, competitors: list,
+                  since: Optional[datetime] = None) -> list:
+    results = list(iter_signals(product_name, competitors, since=since))
     print(f"[Reddit] Total: {len(results)} signals collected")
     return results
@@ -5,19 +5,29 @@ from typing import List, Dict, Any
 import uvicorn
 import smtplib
 import os
+from contextlib import asynccontextmanager
 from email.mime.text import MIMEText
 
+import http_client
+import llm_gateway
+
 from synthesizer import (
-    run_pipeline,
+    analyze_product,
     collect_signals,
     classify_signals,
     cluster_themes,
     compute_summary,
-    validate_and_classify,
-    enrich_product_context,
 )
 
-app = FastAPI(title="Briefd API")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    # Pooled scraper and model connections live for the whole process
+    http_client.close_all()
+    llm_gateway.close()
+
+
+app = FastAPI(title="Briefd API", lifespan=lifespan)
 
 frontend_origins = [
     origin.strip()
@@ -83,22 +93,14 @@ def analyze(req: AnalyzeRequest):
     try:
         print("[Analyze] route hit")
 
-        is_valid, category, error_msg = validate_and_classify(req.product)
-
-        if not is_valid:
-            raise HTTPException(status_code=400, detail=error_msg)
-
-        if not category or category.lower() == "unknown":
-            category = "Other"
+        # Profile (validity, category, enrichment) resolves alongside
+        # signal collection; see synthesizer.analyze_product
+        pipeline_output = analyze_product(req.product)
 
-        enrichment_context = enrich_product_context(req.product, category)
+        if pipeline_output.get("invalid"):
+            raise HTTPException(status_code=400, detail=pipeline_output["message"])
 
-        pipeline_output = run_pipeline(
-            req.product,
-            [],
-            category=category,
-            enrichment_context=enrichment_context,
-        )
+        category = pipeline_output.get("category", "Other")
 
         # ── Insufficient signal guard ─────────────────────────────────────
         if pipeline_output.get("insufficient_data"):
@@ -111,6 +113,7 @@ def analyze(req: AnalyzeRequest):
                 "message": pipeline_output.get(
                     "message", "Not enough public signals found."
                 ),
+                "metrics": pipeline_output.get("metrics"),
             }
         # ─────────────────────────────────────────────────────────────────
 
@@ -124,7 +127,8 @@ def analyze(req: AnalyzeRequest):
         return {
             "category": category,
             "product": product_result,
-            "competitors": competitor_results
+            "competitors": competitor_results,
+            "metrics": pipeline_output.get("metrics"),
         }
 
     except HTTPException:
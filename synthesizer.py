@@ -1,50 +1,134 @@
-import os
+import re
 import json
-from datetime import datetime
-from anthropic import Anthropic
-from scrapers.reddit import fetch_signals
-from scrapers.playstore import fetch_reviews
-from scrapers.appstore import fetch_reviews as fetch_appstore_reviews
+import hashlib
+import heapq
+import queue
+from datetime import datetime, timedelta, timezone
+from scrapers.reddit import iter_signals, WINDOW_DAYS as REDDIT_WINDOW_DAYS
+from scrapers.playstore import iter_reviews, WINDOW_DAYS as PLAYSTORE_WINDOW_DAYS
+from scrapers.appstore import (
+    iter_reviews as iter_appstore_reviews,
+    WINDOW_DAYS as APPSTORE_WINDOW_DAYS,
+)
+import database
+import fixtures
+from dedupe import NearDuplicateIndex, collapse_near_duplicates
+import llm_gateway
+import local_cluster
+from json_stream import JsonArrayStream
+import metrics
+from metrics import ContextThreadPoolExecutor
+from pipeline_dag import Stage, StopPipeline, cancelled, run_dag
 from db import SessionLocal
 from models import Signal, WeeklySnapshot, ThemeSnapshot
 from dotenv import load_dotenv
 from config import KNOWN_APPS
+from discovery import load_profile, save_profile
 
 load_dotenv()
 
 MAX_SIGNALS = 200
 SIGNAL_THRESHOLD = 15  # minimum signals required for meaningful analysis
+RUNTIME_BUDGET_SECONDS = 90  # end-to-end target from CONTEXT.md
+
+
+def _use_memos() -> bool:
+    """Whether model answers are read from / written to the stored profile, sentiment and insight memos."""
+    return llm_gateway.persistent() and not fixtures.active() and not cancelled()
 
 
 # ==========================================================
-# JSON EXTRACTION
+# SIGNAL COLLECTION
 # ==========================================================
-def extract_json(text: str):
-    text = text.strip()
-    start = text.find("[")
-    if start == -1:
-        raise ValueError("No JSON array found.")
+# source -> (streaming scraper, full window in days)
+_SOURCES = {
+    "reddit":    (iter_signals,          REDDIT_WINDOW_DAYS),
+    "playstore": (iter_reviews,          PLAYSTORE_WINDOW_DAYS),
+    "appstore":  (iter_appstore_reviews, APPSTORE_WINDOW_DAYS),
+}
+_COLLECT_WORKERS = 6   # bound on concurrent (source, term) fetches per run
 
-    bracket_count = 0
-    for i in range(start, len(text)):
-        if text[i] == "[":
-            bracket_count += 1
-        elif text[i] == "]":
-            bracket_count -= 1
-            if bracket_count == 0:
-                return json.loads(text[start:i+1])
 
-    raise ValueError("Unbalanced JSON array.")
+def _iter_source_term(source: str, term: str, incremental: bool = True):
+    """
+    Stream one scraper for one term. Scraper failure ends the stream quietly.
 
+    Incremental mode only asks the scraper for items on or after the stored
+    high-water mark, persists what comes back, and then yields the stored
+    signals still inside the source's window.
+    """
+    iterate, window_days = _SOURCES[source]
+    key = term.strip().lower()
+    try:
+        # Fixture runs fetch the full window so replays don't depend on the database
+        if not incremental or fixtures.active():
+            for s in iterate(term, []):
+                if cancelled():
+                    return
+                yield s
+            return
+
+        since = database.load_watermark(source, key)
+        fresh = []
+        for s in iterate(term, [], since=since):
+            if cancelled():
+                break
+            fresh.append(s)
+            yield s
+        # A stopped run (e.g. invalid product) keeps nothing
+        if cancelled():
+            print(f"[Signals] {source} '{term}': run stopped, not storing {len(fresh)} signals")
+            return
+        database.save_signals(source, key, fresh)
+        if since is None:
+            return
+
+        cutoff = datetime.now(timezone.utc) - timedelta(days=window_days)
+        fresh_urls = {s["url"] for s in fresh}
+        stored = [
+            s for s in database.load_window(source, key, cutoff)
+            if s["url"] not in fresh_urls
+        ]
+        print(f"[Signals] {source} '{term}': {len(fresh)} new since "
+              f"{since:%Y-%m-%d} + {len(stored)} stored")
+        yield from stored
+    except Exception as e:
+        print(f"[Signals] {source} failed for '{term}': {e}")
 
-# ==========================================================
-# SIGNAL COLLECTION
-# ==========================================================
-def collect_signals(product_name, competitors):
+
+def _fetch_source_term(source: str, term: str, incremental: bool = True) -> list:
+    return list(_iter_source_term(source, term, incremental))
+
+
+def _collect_all(terms: list, concurrent: bool, incremental: bool) -> dict:
+    """Run every (source, term) pair, fanned out onto a bounded thread pool if concurrent."""
+    jobs = [(source, term) for source in _SOURCES for term in terms]
+    by_source = {source: [] for source in _SOURCES}
+
+    if not concurrent:
+        for source, term in jobs:
+            by_source[source].extend(_fetch_source_term(source, term, incremental))
+        return by_source
+
+    with ContextThreadPoolExecutor(max_workers=min(_COLLECT_WORKERS, len(jobs))) as pool:
+        futures = [
+            pool.submit(_fetch_source_term, source, term, incremental)
+            for source, term in jobs
+        ]
+        # Merge in submission order so output is deterministic
+        for (source, _), future in zip(jobs, futures):
+            by_source[source].extend(future.result())
+
+    return by_source
+
+
+def collect_signals(product_name, competitors, concurrent: bool = True,
+                    incremental: bool = True):
     # ── Fetch from all three sources ─────────────────────────────────────
-    reddit   = fetch_signals(product_name, competitors)
-    playstore = fetch_reviews(product_name, competitors)
-    appstore  = fetch_appstore_reviews(product_name, competitors)
+    by_source = _collect_all([product_name] + list(competitors), concurrent, incremental)
+    reddit    = by_source["reddit"]
+    playstore = by_source["playstore"]
+    appstore  = by_source["appstore"]
 
     print(f"[Signals] Reddit={len(reddit)}  PlayStore={len(playstore)}  AppStore={len(appstore)}")
 
@@ -59,12 +143,106 @@ def collect_signals(product_name, competitors):
             seen.add(url)
             deduped.append(s)
 
+    # ── Collapse near-duplicates (cross-posts, copy-paste reviews) ───────
+    url_deduped = len(deduped)
+    deduped = collapse_near_duplicates(deduped)
+
     deduped.sort(key=lambda x: x.get("score", 0), reverse=True)
 
-    print(f"[Signals] Total deduped: {len(deduped)} -> capped at {MAX_SIGNALS}")
+    print(f"[Signals] Total deduped: {url_deduped} by URL, {len(deduped)} after "
+          f"near-duplicate collapse -> capped at {MAX_SIGNALS}")
     return deduped[:MAX_SIGNALS]
 
 
+# ==========================================================
+# STREAMING COLLECTION + CLASSIFICATION
+# Scrapers yield signals as pages arrive; classification batches
+# go out as soon as 50 candidates are in hand, overlapping LLM
+# latency with network latency. A bounded top-k heap replaces
+# the score sort + cap, so the full list is never held.
+# ==========================================================
+_STREAM_DONE = object()
+_STREAM_CLASSIFY_WORKERS = 4
+
+
+def stream_signals(product_name, competitors, incremental: bool = True):
+    """Yield URL-deduplicated signals from all (source, term) jobs as they arrive."""
+    jobs = [(source, term) for source in _SOURCES for term in [product_name] + list(competitors)]
+    arrivals = queue.Queue()
+
+    def _run(source, term):
+        try:
+            for s in _iter_source_term(source, term, incremental):
+                arrivals.put(s)
+        finally:
+            arrivals.put(_STREAM_DONE)
+
+    seen = set()
+    remaining = len(jobs)
+    with ContextThreadPoolExecutor(max_workers=min(_COLLECT_WORKERS, len(jobs))) as pool:
+        for source, term in jobs:
+            pool.submit(_run, source, term)
+
+        while remaining:
+            item = arrivals.get()
+            if item is _STREAM_DONE:
+                remaining -= 1
+                continue
+            url = item.get("url")
+            if url and url not in seen:
+                seen.add(url)
+                yield item
+
+
+def collect_and_classify_stream(product_name, competitors, incremental: bool = True):
+    """
+    Streaming equivalent of collect_signals() + classify_signals().
+    Returns the top MAX_SIGNALS signals by score, each with a sentiment.
+    """
+    heap = []          # (score, -arrival, signal): min is the first to evict
+    live = set()       # arrival numbers currently in the heap
+    pending = []       # (arrival, signal) admitted but not yet sent to classify
+    futures = []
+    arrived = 0
+    near_dups = NearDuplicateIndex()
+
+    def _dispatch(pool):
+        batch = [s for n, s in pending if n in live]
+        pending.clear()
+        if batch:
+            futures.append(pool.submit(classify_signals, batch))
+
+    with ContextThreadPoolExecutor(max_workers=_STREAM_CLASSIFY_WORKERS) as pool:
+        for s in stream_signals(product_name, competitors, incremental):
+            if near_dups.add(s) is not None:
+                continue
+            arrived += 1
+            entry = (s.get("score", 0), -arrived, s)
+            if len(heap) < MAX_SIGNALS:
+                heapq.heappush(heap, entry)
+            elif entry[:2] > heap[0][:2]:
+                evicted = heapq.heapreplace(heap, entry)
+                live.discard(-evicted[1])
+            else:
+                continue
+            live.add(arrived)
+            pending.append((arrived, s))
+
+            if sum(1 for n, _ in pending if n in live) >= _CLASSIFY_BATCH:
+                _dispatch(pool)
+
+        # Too few signals to analyse: skip the final partial batch
+        if len(heap) >= SIGNAL_THRESHOLD:
+            _dispatch(pool)
+        for f in futures:
+            f.result()
+
+    signals = [s for _, _, s in sorted(heap, key=lambda e: (-e[0], -e[1]))]
+    print(f"[Stream] {arrived} deduped signals streamed -> kept top {len(signals)}, "
+          f"{len(futures)} classify batches")
+    return signals
+
+
 # ==========================================================
 # CLASSIFICATION
 # ==========================================================
@@ -73,87 +251,209 @@ _CLASSIFY_PROMPT = (
     "Return ONLY a valid JSON array. No explanation, no markdown.\n"
     "Format: [{\"id\": <number>, \"sentiment\": \"negative\" | \"mixed\" | \"positive\"}]"
 )
-_CLASSIFY_BATCH = 50   # signals per batch — keeps output well under token limits
+_CLASSIFY_BATCH = 50   # signals per streaming dispatch to classify_signals
+_CLASSIFY_WORKERS = 4  # batches in flight per classify_signals call
+
+# Token-budget batching: batches are packed by estimated input tokens rather
+# than item count, and max_tokens is sized from the items actually sent.
+_CLASSIFY_INPUT_BUDGET = 6000  # est. input tokens per batch (prompt excluded)
+_CLASSIFY_MAX_ITEMS = 120      # cap so one bad reply never loses too many labels
+_ITEM_MAX_CHARS = 600          # longer texts are reduced to their key sentences
+_OUTPUT_TOKENS_PER_ITEM = 25   # {"id": 123, "sentiment": "negative"}, with room for spacing
+_OUTPUT_TOKENS_OVERHEAD = 200  # preamble / fences the model adds despite the prompt
+_OUTPUT_TOKENS_MAX = 4096      # claude-3-haiku output limit
+
+_SENTENCE_SPLIT = re.compile(r"(?<=[.!?])\s+|\n+")
+
+# Local pre-classification from star ratings. Store reviews whose rating and
+# text agree are labelled here; only ambiguous items (3–4 stars, Reddit posts,
+# rating/text disagreement) are sent to the model.
+_RATED_SOURCES = {"playstore", "appstore"}
+_COMPLAINT_WORDS = (
+    "crash", "bug", "glitch", "freeze", "frozen", "slow", "lag", "broken",
+    "error", "not working", "doesn't work", "does not work", "stopped working",
+    "can't", "cannot", "won't", "unable", "issue", "problem", "please fix",
+    "annoying", "worst", "terrible", "horrible", "refund", "scam", "too many ads",
+    "but ", "however", "except",
+)
+_PRAISE_WORDS = ("love", "great", "awesome", "excellent", "amazing", "perfect", "best app")
 
 
-def classify_signals(signals):
-    if not signals:
-        return signals
+def _prelabel(signal: dict):
+    """Return a confident sentiment from the star rating, or None if ambiguous."""
+    if signal.get("source") not in _RATED_SOURCES:
+        return None
 
-    api_key = os.getenv("ANTHROPIC_API_KEY")
-    if not api_key:
-        print("[Classify] No API key — defaulting all signals to 'negative'.")
-        for s in signals:
-            s["sentiment"] = "negative"
-        return signals
+    rating = signal.get("score", 0)
+    text = f"{signal.get('title', '')} {signal.get('text', '')}".lower()
 
-    client = Anthropic(api_key=api_key)
+    if rating in (1, 2):
+        # "Love it but..." style 1-stars go to the model
+        has_praise = any(w in text for w in _PRAISE_WORDS)
+        has_complaint = any(w in text for w in _COMPLAINT_WORDS)
+        return "negative" if has_complaint or not has_praise else None
+    if rating == 5 and not any(w in text for w in _COMPLAINT_WORDS):
+        return "positive"
+    return None
 
-    # Set fallback before any API calls so partial failures are safe
-    for s in signals:
-        s["sentiment"] = "negative"
 
-    batches = range(0, len(signals), _CLASSIFY_BATCH)
-    print(f"[Classify] {len(signals)} signals -> {len(list(batches))} batches of {_CLASSIFY_BATCH}")
+def _estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token for English text)."""
+    return len(text) // 4 + 1
 
-    for batch_start in range(0, len(signals), _CLASSIFY_BATCH):
-        batch = signals[batch_start: batch_start + _CLASSIFY_BATCH]
-        try:
-            lines = []
-            for j, s in enumerate(batch):
-                text = (s.get("title", "") + " " + s.get("text", ""))[:300]
-                lines.append(f"{batch_start + j}. {text}")
-
-            response = client.messages.create(
-                model="claude-3-haiku-20240307",
-                max_tokens=2048,   # 50 items × ~10 tokens + overhead = ~600; 2048 is safe
-                temperature=0,
-                messages=[{
-                    "role": "user",
-                    "content": _CLASSIFY_PROMPT + "\n\n" + "\n".join(lines)
-                }]
-            )
 
-            classified = extract_json(response.content[0].text)
-            for item in classified:
-                idx = item.get("id")
-                if idx is not None and 0 <= idx < len(signals):
-                    signals[idx]["sentiment"] = item.get("sentiment", "negative")
+def _key_sentences(text: str, limit: int = _ITEM_MAX_CHARS) -> str:
+    """
+    Shorten text to about `limit` characters by keeping the sentences that
+    carry sentiment (complaint / praise words), plus the opening sentence for
+    context, in their original order. A plain prefix cut loses the complaint
+    at the end of a long post.
+    """
+    if len(text) <= limit:
+        return text
+    sentences = [x.strip() for x in _SENTENCE_SPLIT.split(text) if x.strip()]
+    if len(sentences) <= 1:
+        return text[:limit]
+
+    def weight(i):
+        lowered = sentences[i].lower()
+        hits = sum(w in lowered for w in _COMPLAINT_WORDS + _PRAISE_WORDS)
+        return (i == 0) + hits
+
+    kept, used = set(), 0
+    for i in sorted(range(len(sentences)), key=lambda i: (-weight(i), i)):
+        if used + len(sentences[i]) > limit:
+            continue
+        kept.add(i)
+        used += len(sentences[i]) + 1
+    if not kept:
+        return sentences[0][:limit]
+    return " ".join(sentences[i] for i in sorted(kept))
+
+
+def _classify_line(signals, idx) -> str:
+    s = signals[idx]
+    text = " ".join((s.get("title", "") + " " + s.get("text", "")).split())
+    return f"{idx}. {_key_sentences(text)}"
+
+
+def _pack_batches(signals, todo) -> list:
+    """Group indices into [(ids, lines)] under the input token budget."""
+    batches, ids, lines, tokens = [], [], [], 0
+    for idx in todo:
+        line = _classify_line(signals, idx)
+        cost = _estimate_tokens(line)
+        if ids and (tokens + cost > _CLASSIFY_INPUT_BUDGET or len(ids) >= _CLASSIFY_MAX_ITEMS):
+            batches.append((ids, lines))
+            ids, lines, tokens = [], [], 0
+        ids.append(idx)
+        lines.append(line)
+        tokens += cost
+    if ids:
+        batches.append((ids, lines))
+    return batches
 
-            batch_num = batch_start // _CLASSIFY_BATCH + 1
-            print(f"[Classify] Batch {batch_num}: {len(classified)} items classified")
 
-        except Exception as e:
-            batch_num = batch_start // _CLASSIFY_BATCH + 1
-            print(f"[Classify] Batch {batch_num} failed (keeping 'negative' default): {e}")
+def classify_signals(signals):
+    if not signals:
+        return signals
 
-    return signals
+    # Pre-label from ratings; 'negative' doubles as the fallback for the rest
+    # so partial failures are safe
+    todo = []
+    for i, s in enumerate(signals):
+        label = _prelabel(s)
+        s["sentiment"] = label or "negative"
+        if label is None:
+            todo.append(i)
+    # Reuse labels stored by earlier runs for unchanged content
+    keys = {i: database.content_key(signals[i]) for i in todo}
+    memo = database.load_sentiments(list(keys.values())) if _use_memos() else {}
+    remembered = len(todo)
+    todo = [i for i in todo if keys[i] not in memo]
+    for i, key in keys.items():
+        if key in memo:
+            signals[i]["sentiment"] = memo[key]
+    remembered -= len(todo)
+
+    print(f"[Classify] {len(signals) - len(keys)} signals pre-labelled from ratings, "
+          f"{remembered} from stored sentiment, {len(todo)} to classify")
+
+    if not todo:
+        return signals
 
+    if not llm_gateway.available():
+        print("[Classify] No API key — defaulting ambiguous signals to 'negative'.")
+        return signals
 
-# ==========================================================
-# CLUSTERING WITH FALLBACK
-# ==========================================================
-def cluster_themes(signals, category_hint: str = ""):
-    api_key = os.getenv("ANTHROPIC_API_KEY")
+    metrics.add("signals_to_model", len(todo))
+    batches = _pack_batches(signals, todo)
+    print(f"[Classify] {len(todo)} signals -> {len(batches)} batches "
+          f"(~{_CLASSIFY_INPUT_BUDGET} input tokens each)")
+
+    # Batches are independent: each writes back only its own indices
+    workers = min(_CLASSIFY_WORKERS, len(batches))
+    with ContextThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(_classify_batch, signals, batch_ids, lines, batch_num)
+            for batch_num, (batch_ids, lines) in enumerate(batches, start=1)
+        ]
+        classified = [idx for f in futures for idx in f.result()]
+
+    # Only model labels are memoised — never the 'negative' fallback
+    if _use_memos():
+        database.save_sentiments([signals[i] for i in classified])
+    return signals
 
-    if not signals:
-        print("No signals for clustering.")
-        return []
 
-    if not api_key:
-        print("No API key for clustering.")
-        return fallback_cluster(signals)
+def _classify_batch(signals, batch_ids, lines, batch_num) -> list:
+    """
+    Classify one batch in place and return the indices the model labelled;
+    items it never labelled keep 'negative'.
+    """
+    wanted = set(batch_ids)
+    labelled = []
+    try:
+        # Items are applied as they stream in, so a response cut off by
+        # max_tokens (or a dropped stream) keeps every completed label
+        parser = JsonArrayStream()
+        for chunk in llm_gateway.stream_text(
+            tier="classify",
+            max_tokens=min(_OUTPUT_TOKENS_MAX,
+                           _OUTPUT_TOKENS_OVERHEAD + _OUTPUT_TOKENS_PER_ITEM * len(batch_ids)),
+            temperature=0,
+            messages=[{
+                "role": "user",
+                "content": _CLASSIFY_PROMPT + "\n\n" + "\n".join(lines)
+            }]
+        ):
+            for item in parser.feed(chunk):
+                idx = item.get("id") if isinstance(item, dict) else None
+                if idx in wanted and item.get("sentiment"):
+                    signals[idx]["sentiment"] = item["sentiment"]
+                    labelled.append(idx)
 
-    client = Anthropic(api_key=api_key)
+        note = "" if parser.done else " (response truncated)"
+        print(f"[Classify] Batch {batch_num}: {len(labelled)} items classified{note}")
+
+    except Exception as e:
+        print(f"[Classify] Batch {batch_num} failed after {len(labelled)} items "
+              f"(keeping 'negative' default for the rest): {e}")
+    return labelled
 
-    try:
-        lines = []
-        for i, s in enumerate(signals):
-            text = s.get("text", "")[:300]
-            lines.append(f"{i}. {text}")
 
-        hint_line = f"\n{category_hint}\n" if category_hint else ""
-        prompt = f"""
+# ==========================================================
+# CLUSTERING WITH FALLBACK
+# ==========================================================
+# Map-reduce: signals are clustered in chunks on parallel calls (map), then
+# partial themes whose members read alike are merged locally, down to at
+# most 6 (reduce, local_cluster.merge_themes). Each call's
+# "indices" output stays short, so large negative sets no longer truncate
+# the JSON and drop the whole run to fallback_cluster.
+_CLUSTER_CHUNK = 60        # signals per clustering call
+_CLUSTER_WORKERS = 4       # clustering calls in flight
+
+_CLUSTER_PROMPT = """
 Cluster these complaints into 3-6 distinct root cause themes.{hint_line}
 Return ONLY valid JSON array.
 
@@ -168,76 +468,112 @@ Format:
 ]
 """
 
-        response = client.messages.create(
-            model="claude-3-haiku-20240307",
-            max_tokens=2000,
-            temperature=0,
-            messages=[{
-                "role": "user",
-                "content": prompt + "\n\n" + "\n".join(lines)
-            }]
-        )
-
-        response_text = response.content[0].text
-        themes_raw = extract_json(response_text)
-
-        themes = []
 
-        for t in themes_raw:
-            indices = t.get("indices", [])
-            quotes = [signals[i] for i in indices if i < len(signals)]
+def cluster_themes(signals, category_hint: str = ""):
+    if not signals:
+        print("No signals for clustering.")
+        return []
 
-            themes.append({
-                "name": t.get("name", "Unnamed"),
-                "frequency": len(indices),
-                "emotional_intensity": t.get("emotional_intensity", 5),
-                "primary_segment": t.get("primary_segment", "General"),
-                "quotes": quotes[:5]
-            })
+    if not llm_gateway.available():
+        print("No API key for clustering.")
+        return fallback_cluster(signals)
 
-        if not themes:
-            return fallback_cluster(signals)
+    chunks = [list(range(i, min(i + _CLUSTER_CHUNK, len(signals))))
+              for i in range(0, len(signals), _CLUSTER_CHUNK)]
+    print(f"[Cluster] {len(signals)} signals -> {len(chunks)} chunks")
 
-        return sorted(themes, key=lambda x: x["frequency"], reverse=True)
+    workers = min(_CLUSTER_WORKERS, len(chunks))
+    with ContextThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(_cluster_chunk, signals, chunk, category_hint)
+            for chunk in chunks
+        ]
+        partials = [f.result() for f in futures]
 
-    except Exception as e:
-        print("Clustering failed, using fallback:", e)
+    if not any(partials):
         return fallback_cluster(signals)
 
+    # A failed chunk still contributes, through local clustering
+    partial_themes = []
+    for chunk, themes in zip(chunks, partials):
+        if themes:
+            partial_themes.extend(themes)
+            continue
+        for t in local_cluster.cluster_indices([signals[i] for i in chunk]):
+            partial_themes.append({**t, "indices": [chunk[i] for i in t["indices"]]})
+
+    merged = local_cluster.merge_themes(signals, partial_themes)
+    print(f"[Cluster] {len(partial_themes)} partial themes -> {len(merged)} merged")
+    themes = [_theme_from_indices(signals, t) for t in merged]
+    return sorted(themes, key=lambda x: x["frequency"], reverse=True)
 
-# ==========================================================
-# SAFE FALLBACK CLUSTER
-# ==========================================================
-def fallback_cluster(signals):
-    print("Using fallback clustering.")
 
-    buckets = {}
+def _cluster_chunk(signals, chunk, category_hint: str = "") -> list:
+    """
+    Cluster one chunk; returns partial themes with global indices. Themes
+    that completed before a truncation or stream failure are kept; [] means
+    nothing usable came back.
+    """
+    lines = []
+    for local, i in enumerate(chunk):
+        text = signals[i].get("text", "")[:300]
+        lines.append(f"{local}. {text}")
 
-    for s in signals:
-        text = s.get("text", "").lower()
+    hint_line = f"\n{category_hint}\n" if category_hint else ""
+    themes = []
+    try:
+        parser = JsonArrayStream()
+        for piece in llm_gateway.stream_text(
+            tier="cluster",
+            max_tokens=2000,
+            temperature=0,
+            messages=[{
+                "role": "user",
+                "content": _CLUSTER_PROMPT.format(hint_line=hint_line) + "\n\n" + "\n".join(lines)
+            }]
+        ):
+            for t in parser.feed(piece):
+                if not isinstance(t, dict):
+                    continue
+                indices = [chunk[i] for i in t.get("indices", [])
+                           if isinstance(i, int) and 0 <= i < len(chunk)]
+                if not indices:
+                    continue
+                themes.append({
+                    "name": t.get("name", "Unnamed"),
+                    "indices": indices,
+                    "emotional_intensity": t.get("emotional_intensity", 5),
+                    "primary_segment": t.get("primary_segment", "General"),
+                })
+        if not parser.done:
+            print(f"[Cluster] Chunk at {chunk[0]} truncated, kept {len(themes)} themes")
 
-        if "crash" in text or "bug" in text:
-            key = "Stability Issues"
-        elif "slow" in text:
-            key = "Performance Issues"
-        elif "price" in text:
-            key = "Pricing Concerns"
+    except Exception as e:
+        if themes:
+            print(f"[Cluster] Chunk at {chunk[0]} failed after {len(themes)} themes, keeping them: {e}")
         else:
-            key = "General Experience"
+            print(f"[Cluster] Chunk at {chunk[0]} failed, clustering it locally: {e}")
+    return themes
 
-        buckets.setdefault(key, []).append(s)
 
-    themes = []
-    for name, items in buckets.items():
-        themes.append({
-            "name": name,
-            "frequency": len(items),
-            "emotional_intensity": 6,
-            "primary_segment": "General",
-            "quotes": items[:5]
-        })
+def _theme_from_indices(signals, t: dict) -> dict:
+    quotes = [signals[i] for i in t["indices"]]
+    return {
+        "name": t["name"],
+        # Collapsed near-duplicates count towards their representative
+        "frequency": sum(q.get("duplicate_count", 1) for q in quotes),
+        "emotional_intensity": t.get("emotional_intensity", 5),
+        "primary_segment": t.get("primary_segment", "General"),
+        "quotes": quotes[:5]
+    }
 
-    return themes
+
+# ==========================================================
+# LOCAL CLUSTER (no model / failed model call)
+# ==========================================================
+def fallback_cluster(signals):
+    print("[Cluster] Using local clustering.")
+    return local_cluster.cluster_signals(signals)
 
 
 # ==========================================================
@@ -256,17 +592,15 @@ def compute_summary(signals):
 # PRODUCT CATEGORY CLASSIFICATION
 # ==========================================================
 VALID_CATEGORIES = {"SaaS", "Marketplace", "Consumer App", "Developer Tool", "Fintech"}
+_INVALID_PRODUCT_MSG = "Currently supports digital product platforms only."
 
 def classify_product_category(product_name: str) -> str:
-    api_key = os.getenv("ANTHROPIC_API_KEY")
-    if not api_key:
+    if not llm_gateway.available():
         return "Other"
 
-    client = Anthropic(api_key=api_key)
-
     try:
-        response = client.messages.create(
-            model="claude-3-haiku-20240307",
+        response = llm_gateway.create_message(
+            tier="enrich",
             max_tokens=20,
             temperature=0,
             messages=[{
@@ -294,79 +628,7 @@ def classify_product_category(product_name: str) -> str:
 
 
 # ==========================================================
-# COMBINED VALIDATION + CLASSIFICATION  (one haiku call)
-# ==========================================================
-def validate_and_classify(product_name: str) -> tuple:
-    """
-    Returns (is_valid: bool, category: str, error_msg: str).
-    Validates the product is a digital platform and classifies it.
-    Falls back permissively on LLM failure.
-
-    KNOWN_APPS products skip the INVALID gate — they are curated digital
-    platforms and should never be rejected by the LLM validation step.
-    """
-    api_key = os.getenv("ANTHROPIC_API_KEY")
-    if not api_key:
-        return True, "Other", ""
-
-    client = Anthropic(api_key=api_key)
-    name_lower = product_name.strip().lower()
-
-    # ── Fast path: KNOWN_APPS products are definitively valid digital platforms ──
-    if name_lower in KNOWN_APPS:
-        try:
-            response = client.messages.create(
-                model="claude-3-haiku-20240307",
-                max_tokens=20,
-                temperature=0,
-                messages=[{
-                    "role": "user",
-                    "content": (
-                        "Classify the following product into ONE of these categories. "
-                        "Reply with ONLY the category name, nothing else.\n"
-                        "Categories: SaaS | Marketplace | Consumer App | Developer Tool | Fintech | Other\n\n"
-                        f"Product: {product_name}"
-                    )
-                }]
-            )
-            category = response.content[0].text.strip()
-            category = category if category in VALID_CATEGORIES else "Other"
-            return True, category, ""
-        except Exception as e:
-            print("validate_and_classify (known app) failed, using defaults:", e)
-            return True, "Other", ""
-
-    # ── Unknown products: full validate + classify ────────────────────────────
-    try:
-        response = client.messages.create(
-            model="claude-3-haiku-20240307",
-            max_tokens=30,
-            temperature=0,
-            messages=[{
-                "role": "user",
-                "content": (
-                    "Evaluate the product below.\n"
-                    "Reply INVALID only if it has NO digital presence at all "
-                    "(e.g. a physical-only store, hardware device, or offline-only business with no app or website).\n"
-                    "Any company with a mobile app, web app, or SaaS platform is valid.\n"
-                    "Otherwise reply with exactly ONE of: "
-                    "SaaS | Marketplace | Consumer App | Developer Tool | Fintech | Other\n\n"
-                    f"Product: {product_name}"
-                )
-            }]
-        )
-        text = response.content[0].text.strip()
-        if text == "INVALID":
-            return False, "", "Currently supports digital product platforms only."
-        category = text if text in VALID_CATEGORIES else "Other"
-        return True, category, ""
-    except Exception as e:
-        print("validate_and_classify failed, using defaults:", e)
-        return True, "Other", ""
-
-
-# ==========================================================
-# OPTIONAL REAL-TIME ENRICHMENT
+# CATEGORY ANALYSIS HINTS
 # ==========================================================
 
 # Category-specific clustering hints for deeper analysis routing
@@ -394,38 +656,83 @@ CATEGORY_ANALYSIS_HINTS: dict[str, str] = {
 }
 
 
-def enrich_product_context(product_name: str, category: str) -> str:
+# ==========================================================
+# PRODUCT PROFILE  (validation + category + enrichment)
+# Stored on Product and served from there until it goes stale;
+# on a miss, one haiku call answers all three.
+# ==========================================================
+def _profile_from_model(product_name: str) -> dict:
+    """One call for validity, category and context. Raises on failure."""
+    known = product_name.strip().lower() in KNOWN_APPS
+    validity = (
+        "It is a curated digital platform, so \"valid\" must be true.\n"
+        if known else
+        "\"valid\" is false only if it has NO digital presence at all "
+        "(e.g. a physical-only store, hardware device, or offline-only business "
+        "with no app or website). Any company with a mobile app, web app, or SaaS "
+        "platform is valid.\n"
+    )
+    response = llm_gateway.create_message(
+        tier="enrich",
+        max_tokens=350,
+        temperature=0,
+        messages=[{
+            "role": "user",
+            "content": (
+                "Evaluate the product below. Return ONLY a valid JSON object. "
+                "No markdown. No explanation.\n"
+                "{\n"
+                '  "valid": true | false,\n'
+                '  "category": "SaaS" | "Marketplace" | "Consumer App" | "Developer Tool" | "Fintech" | "Other",\n'
+                '  "context": "4 bullet points max: business model, target users, '
+                'monetization, main competitors"\n'
+                "}\n"
+                f"{validity}"
+                "Be factual and concise in context.\n\n"
+                f"Product: {product_name}"
+            )
+        }]
+    )
+    text = response.content[0].text.strip()
+    start = text.find("{")
+    end = text.rfind("}") + 1
+    if start == -1 or end == 0:
+        raise ValueError("No JSON object in profile response")
+    parsed = json.loads(text[start:end])
+
+    category = parsed.get("category", "Other")
+    return {
+        "is_valid":           known or parsed.get("valid") is not False,
+        "category":           category if category in VALID_CATEGORIES else "Other",
+        "enrichment_context": str(parsed.get("context", "")).strip(),
+    }
+
+
+def resolve_product_profile(product_name: str) -> tuple:
     """
-    Returns a brief enrichment string using model knowledge.
-    Non-blocking: gracefully returns empty string on failure.
-    Used to seed the analysis with product context when live data is sparse.
+    Returns (is_valid, category, error_msg, enrichment_context).
+
+    Served from the Product record while fresh. Otherwise resolved with a
+    single model call and stored. Falls back permissively (valid, "Other",
+    no context) on failure, without storing the fallback.
     """
-    api_key = os.getenv("ANTHROPIC_API_KEY")
-    if not api_key:
-        return ""
+    profile = load_profile(product_name) if _use_memos() else None
+    if profile is not None:
+        print(f"[Profile] '{product_name}' served from store (category={profile['category']})")
+    elif not llm_gateway.available():
+        profile = {"is_valid": True, "category": "Other", "enrichment_context": ""}
+    else:
+        try:
+            profile = _profile_from_model(product_name)
+            if _use_memos():
+                save_profile(product_name, profile)
+        except Exception as e:
+            print("Product profile failed, using defaults:", e)
+            profile = {"is_valid": True, "category": "Other", "enrichment_context": ""}
 
-    client = Anthropic(api_key=api_key)
-    try:
-        response = client.messages.create(
-            model="claude-3-haiku-20240307",
-            max_tokens=250,
-            temperature=0,
-            messages=[{
-                "role": "user",
-                "content": (
-                    f"Briefly describe {product_name} ({category}) covering:\n"
-                    "- Business model\n"
-                    "- Target users\n"
-                    "- Monetization\n"
-                    "- Main competitors\n"
-                    "4 bullet points max. Be factual and concise."
-                )
-            }]
-        )
-        return response.content[0].text.strip()
-    except Exception as e:
-        print("Enrichment failed, continuing without context:", e)
-        return ""
+    if not profile["is_valid"]:
+        return False, "", _INVALID_PRODUCT_MSG, ""
+    return True, profile["category"], "", profile["enrichment_context"]
 
 
 # ==========================================================
@@ -441,19 +748,49 @@ _INSIGHTS_EMPTY: dict = {
     "retention_risk_areas": [],
 }
 
-def extract_insights(themes: list, category: str) -> dict:
+# Bump when the insight prompt changes, so memoised answers to the old one stop matching
+_INSIGHTS_PROMPT_VERSION = 1
+
+
+def _theme_fingerprint(top: list, category: str) -> str:
+    """
+    Stable hash of the insight prompt's inputs, the model and the prompt
+    version. Frequencies are bucketed by power of two and intensity rounded,
+    so small week-to-week drift in counts still matches.
+    """
+    parts = [llm_gateway.model_for("insights"), str(_INSIGHTS_PROMPT_VERSION), category or ""]
+    for t in top:
+        try:
+            intensity = round(float(t.get("emotional_intensity", 5)))
+        except (TypeError, ValueError):
+            intensity = 5
+        parts.append("|".join([
+            str(t.get("name", "Unknown")).strip().lower(),
+            str(int(t.get("frequency", 0) or 0).bit_length()),
+            str(intensity),
+            str(t.get("primary_segment", "General")).strip().lower(),
+        ]))
+    return hashlib.sha256("\n".join(parts).encode("utf-8")).hexdigest()
+
+
+def extract_insights(themes: list, category: str, product_name: str = "") -> dict:
     """
     Synthesises top complaint themes into structured pain point intelligence.
-    Single haiku call, ≤400 tokens. Safe: returns empty dict on any failure.
+    Single haiku call, ≤400 tokens, skipped when the same theme fingerprint
+    was seen before. Safe: returns empty dict on any failure.
     """
-    api_key = os.getenv("ANTHROPIC_API_KEY")
-    if not api_key or not themes:
+    if not llm_gateway.available() or not themes:
         return dict(_INSIGHTS_EMPTY)
 
-    client = Anthropic(api_key=api_key)
-
     # Use top 5 themes only to keep the prompt cheap
     top = themes[:5]
+    fingerprint = _theme_fingerprint(top, category)
+    stored = database.load_insights(fingerprint) if _use_memos() else None
+    if stored is not None:
+        print(f"[Insights] Theme set unchanged — reusing stored insights ({fingerprint[:12]})")
+        metrics.record_llm(llm_gateway.model_for("insights"), cached=True)
+        return {**_INSIGHTS_EMPTY, **stored}
+
     theme_lines = "\n".join(
         f"- {t.get('name', 'Unknown')} "
         f"(freq: {t.get('frequency', 0)}, "
@@ -476,8 +813,8 @@ def extract_insights(themes: list, category: str) -> dict:
     )
 
     try:
-        response = client.messages.create(
-            model="claude-3-haiku-20240307",
+        response = llm_gateway.create_message(
+            tier="insights",
             max_tokens=400,
             temperature=0,
             messages=[{"role": "user", "content": prompt}]
@@ -488,12 +825,15 @@ def extract_insights(themes: list, category: str) -> dict:
         if start == -1 or end == 0:
             raise ValueError("No JSON object in insight response")
         parsed = json.loads(text[start:end])
-        return {
+        insights = {
             "core_painpoints":          parsed.get("core_painpoints", []),
             "critical_bottlenecks":     parsed.get("critical_bottlenecks", []),
             "user_frustration_drivers": parsed.get("user_frustration_drivers", []),
             "retention_risk_areas":     parsed.get("retention_risk_areas", []),
         }
+        if any(insights.values()) and _use_memos():
+            database.save_insights(product_name, fingerprint, category, insights)
+        return insights
     except Exception as e:
         print(f"[Insights] Extraction failed, returning empty: {e}")
         return dict(_INSIGHTS_EMPTY)
@@ -501,59 +841,150 @@ def extract_insights(themes: list, category: str) -> dict:
 
 # ==========================================================
 # FULL PIPELINE
+# Declared as a stage DAG (pipeline_dag): independent stages
+# overlap — profile with collection, summary with clustering.
+#
+#   profile ─────────────────────┐
+#   collect ─> classify ─┬─> cluster ─> insights
+#                        └─> summary
 # ==========================================================
-def run_pipeline(product_name, competitors, category: str = "", enrichment_context: str = ""):
-
-    print(f"\n[Pipeline] === START '{product_name}' (category={category or 'unknown'}) ===", flush=True)
+_INSUFFICIENT = {
+    "insufficient_data": True,
+    "message": "Not enough public review signals to generate reliable insights.",
+    "product": {},
+}
 
-    # ── Stage 1: Collect ─────────────────────────────────────────────────
-    signals = collect_signals(product_name, competitors)
-    total_raw = len(signals)
-    print(f"[Pipeline] Stage 1 collect_signals: {total_raw} signals", flush=True)
-
-    if total_raw < SIGNAL_THRESHOLD:
-        print(f"[Pipeline] INSUFFICIENT DATA: {total_raw} < threshold {SIGNAL_THRESHOLD} — aborting.", flush=True)
-        return {
-            "insufficient_data": True,
-            "message": "Not enough public review signals to generate reliable insights.",
-            "product": {},
-        }
 
-    # ── Stage 2: Classify ────────────────────────────────────────────────
-    signals = classify_signals(signals)
-    print(f"[Pipeline] Stage 2 classify_signals: {len(signals)} signals returned", flush=True)
+def _pipeline_stages(product_name, competitors, streaming: bool = False) -> list:
+    """Every stage after the product profile; expects a "profile" value."""
 
-    sentiments = {}
-    for s in signals:
-        k = s.get("sentiment", "none")
-        sentiments[k] = sentiments.get(k, 0) + 1
-    print(f"[Pipeline] Sentiment distribution: {sentiments}", flush=True)
+    def collect():
+        # Streaming mode also classifies as it goes
+        if streaming:
+            signals = collect_and_classify_stream(product_name, competitors)
+        else:
+            signals = collect_signals(product_name, competitors)
+        print(f"[Pipeline] collect_signals: {len(signals)} signals", flush=True)
+        return signals
 
-    # ── Stage 3: Cluster (negative + mixed only) ─────────────────────────
-    negative_signals = [s for s in signals if s.get("sentiment") in ["negative", "mixed"]]
-    print(f"[Pipeline] Stage 3 negative filter: {len(negative_signals)} signals for clustering", flush=True)
+    def gate(collect, profile):
+        # Waits for the profile too, so an invalid product always wins over
+        # too-little-data and early results carry the real category
+        if len(collect) < SIGNAL_THRESHOLD:
+            print(f"[Pipeline] INSUFFICIENT DATA: {len(collect)} < threshold "
+                  f"{SIGNAL_THRESHOLD} — aborting.", flush=True)
+            raise StopPipeline(dict(_INSUFFICIENT))
+        return collect
+
+    def classify(gate):
+        metrics.count("signals", len(gate))
+        signals = gate if streaming else classify_signals(gate)
+        sentiments = {}
+        for s in signals:
+            k = s.get("sentiment", "none")
+            sentiments[k] = sentiments.get(k, 0) + 1
+        print(f"[Pipeline] Sentiment distribution: {sentiments}", flush=True)
+        return signals
 
-    category_hint = CATEGORY_ANALYSIS_HINTS.get(category, "")
-    themes = cluster_themes(negative_signals, category_hint=category_hint)
-    print(f"[Pipeline] Stage 3 cluster_themes: {len(themes)} themes generated", flush=True)
+    def cluster(classify, profile):
+        # Negative + mixed only
+        negative_signals = [s for s in classify if s.get("sentiment") in ["negative", "mixed"]]
+        print(f"[Pipeline] negative filter: {len(negative_signals)} signals for clustering", flush=True)
+        category_hint = CATEGORY_ANALYSIS_HINTS.get(profile["category"], "")
+        themes = cluster_themes(negative_signals, category_hint=category_hint)
+        print(f"[Pipeline] cluster_themes: {len(themes)} themes generated", flush=True)
+        return themes
+
+    def summary(classify):
+        # Full signal set, not just negative
+        result = compute_summary(classify)
+        print(f"[Pipeline] compute_summary: total_signals={result['total_signals']}, "
+              f"negative_rate={result['negative_rate']}", flush=True)
+        return result
+
+    def insights(cluster, profile):
+        return extract_insights(cluster, profile["category"], product_name=product_name)
+
+    return [
+        Stage("collect",  collect),
+        Stage("gate",     gate,     deps=["collect", "profile"]),
+        Stage("classify", classify, deps=["gate"]),
+        Stage("cluster",  cluster,  deps=["classify", "profile"]),
+        Stage("summary",  summary,  deps=["classify"]),
+        Stage("insights", insights, deps=["cluster", "profile"]),
+    ]
+
+
+def _pipeline_output(product_name, result, run_metrics) -> dict:
+    if result.stopped is not None:
+        output = dict(result.stopped)
+    else:
+        themes, summary, insights = (result.values[k] for k in ("cluster", "summary", "insights"))
+        print(f"[Pipeline] === DONE: {summary['total_signals']} signals, "
+              f"{len(themes)} themes, insights={'yes' if any(insights.values()) else 'empty'} ===",
+              flush=True)
+        output = {
+            "product": {
+                "themes": themes,
+                "summary": summary,
+                "trend": None,
+                "insights": insights,
+            }
+        }
+    output["timings"] = result.timings
+
+    snapshot = run_metrics.snapshot(result.timings)
+    snapshot["budget"] = {
+        "max_seconds": RUNTIME_BUDGET_SECONDS,
+        # Collection enforces this cap itself; compare "signals" / "signals_to_model"
+        "max_signals": MAX_SIGNALS,
+        "within_time": snapshot["total_seconds"] <= RUNTIME_BUDGET_SECONDS,
+    }
+    totals = snapshot["totals"]
+    print(f"[Metrics] '{product_name}': {snapshot['total_seconds']:.1f}s, "
+          f"{totals['llm_calls']} LLM calls ({totals['llm_cache_hits']} cached), "
+          f"{totals['input_tokens']}+{totals['output_tokens']} tokens, "
+          f"${totals['cost_usd']:.4f}, {totals['http_requests']} HTTP requests", flush=True)
+    if not snapshot["budget"]["within_time"]:
+        print(f"[Metrics] Over the {RUNTIME_BUDGET_SECONDS}s runtime budget", flush=True)
+    if not fixtures.active():
+        database.save_run_metrics(product_name, snapshot)
+    output["metrics"] = snapshot
+    return output
+
+
+def run_pipeline(product_name, competitors, category: str = "", enrichment_context: str = "",
+                 streaming: bool = False):
 
-    # ── Stage 4: Summary (full signal set, not just negative) ────────────
-    summary = compute_summary(signals)
-    print(f"[Pipeline] Stage 4 compute_summary: total_signals={summary['total_signals']}, "
-          f"negative_rate={summary['negative_rate']}", flush=True)
+    print(f"\n[Pipeline] === START '{product_name}' (category={category or 'unknown'}) ===", flush=True)
 
-    # ── Stage 5: Insights ────────────────────────────────────────────────
-    print(f"[Pipeline] Stage 5 extract_insights (category={category or 'unknown'})", flush=True)
-    insights = extract_insights(themes, category)
+    profile = {"category": category, "enrichment_context": enrichment_context}
+    with metrics.run() as run_metrics:
+        result = run_dag(_pipeline_stages(product_name, competitors, streaming),
+                         inputs={"profile": profile})
+        return _pipeline_output(product_name, result, run_metrics)
 
-    print(f"[Pipeline] === DONE: {summary['total_signals']} signals, "
-          f"{len(themes)} themes, insights={'yes' if any(insights.values()) else 'empty'} ===", flush=True)
 
-    return {
-        "product": {
-            "themes": themes,
-            "summary": summary,
-            "trend": None,
-            "insights": insights,
-        }
-    }
\ No newline at end of file
+def analyze_product(product_name, competitors=(), streaming: bool = False) -> dict:
+    """
+    /analyze end to end: the product profile is resolved concurrently with
+    signal collection. An invalid product ends the run with
+    {"invalid": True, "message": ...}; otherwise the result is run_pipeline's
+    output plus "category".
+    """
+    print(f"\n[Pipeline] === START '{product_name}' ===", flush=True)
+
+    def profile():
+        is_valid, category, error_msg, enrichment_context = resolve_product_profile(product_name)
+        if not is_valid:
+            raise StopPipeline({"invalid": True, "message": error_msg})
+        if not category or category.lower() == "unknown":
+            category = "Other"
+        return {"category": category, "enrichment_context": enrichment_context}
+
+    stages = [Stage("profile", profile)] + _pipeline_stages(product_name, list(competitors), streaming)
+    with metrics.run() as run_metrics:
+        result = run_dag(stages)
+        output = _pipeline_output(product_name, result, run_metrics)
+    output["category"] = result.values.get("profile", {}).get("category", "Other")
+    return output